@@ -0,0 +1,43 @@
+import pytest
+from django.core.cache import caches
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmark')
+    group.addoption(
+        '--benchmark', action='store_true',
+        help='Run the endpoint benchmarks against the stored baseline.'
+    )
+    group.addoption(
+        '--benchmark-update-baseline', action='store_true',
+        help='Run the endpoint benchmarks and store the results as the '
+             'new baseline.'
+    )
+    group.addoption(
+        '--benchmark-dataset', default='small',
+        help='A dataset of recipes.benchmark.DATASETS.'
+    )
+    group.addoption('--benchmark-runs', type=int, default=50)
+    group.addoption(
+        '--benchmark-threshold', type=float, default=0.5,
+        help='Allowed relative growth of latency and peak memory.'
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if (
+        config.getoption('benchmark')
+        or config.getoption('benchmark_update_baseline')
+    ):
+        return
+    skip = pytest.mark.skip(reason='needs --benchmark')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+    yield
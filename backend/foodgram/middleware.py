@@ -0,0 +1,125 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Statements longer than this are cut in the slow request log.
+MAX_LOGGED_SQL = 300
+
+
+class QueryStats:
+    """Counts and times the statements of one request, per statement shape."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            # Parameters are passed separately, so the SQL text already
+            # is the shape of the statement.
+            shape = self.shapes.get(sql)
+            if shape is None:
+                self.shapes[sql] = [1, elapsed]
+            else:
+                shape[0] += 1
+                shape[1] += elapsed
+
+    def repeated(self, threshold):
+        """Shapes run at least `threshold` times: likely N+1 queries."""
+        return [
+            (sql, count, duration)
+            for sql, (count, duration) in self.shapes.items()
+            if count >= threshold
+        ]
+
+    def top(self, limit):
+        return sorted(
+            ((sql, count, duration)
+             for sql, (count, duration) in self.shapes.items()),
+            key=lambda shape: shape[2], reverse=True,
+        )[:limit]
+
+
+def server_timing(duration, stats, repeated):
+    metrics = [
+        f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"',
+        f'app;dur={duration:.1f}',
+    ]
+    if repeated:
+        metrics.append(f'nplusone;desc="{len(repeated)} repeated statements"')
+    return ', '.join(metrics)
+
+
+def format_shapes(shapes):
+    return ''.join(
+        f'\n  {count}x {duration * 1000:.1f}ms {sql[:MAX_LOGGED_SQL]}'
+        for sql, count, duration in shapes
+    )
+
+
+class RequestStatsMiddleware:
+    """
+    Counts and times the SQL of every request and, when
+    REQUEST_STATS_HEADER is set (by default only with DEBUG), reports it
+    in a Server-Timing header.
+
+    Slow requests and requests repeating one statement shape
+    REQUEST_STATS_REPEATED times or more are logged with their heaviest
+    statements; only a REQUEST_STATS_SAMPLE_RATE share of them is logged,
+    so the cost under load stays at two clock reads per query. Queries run
+    while a streaming response is consumed are not counted.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_STATS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        duration = (time.perf_counter() - started) * 1000
+        repeated = stats.repeated(settings.REQUEST_STATS_REPEATED)
+        if settings.REQUEST_STATS_HEADER:
+            response['Server-Timing'] = server_timing(
+                duration, stats, repeated
+            )
+        slow = duration >= settings.REQUEST_STATS_SLOW_MS
+        if (
+            (slow or repeated)
+            and random.random() < settings.REQUEST_STATS_SAMPLE_RATE
+        ):
+            self.log(request, response, duration, stats, repeated, slow)
+        return response
+
+    def log(self, request, response, duration, stats, repeated, slow):
+        message = (
+            f'{"Slow request" if slow else "Repeated queries"}: '
+            f'{request.method} {request.get_full_path()} '
+            f'{response.status_code} in {duration:.1f}ms, '
+            f'{stats.count} queries in {stats.duration * 1000:.1f}ms'
+        )
+        if repeated:
+            message += '\nLikely N+1:' + format_shapes(repeated)
+        message += '\nTop statements:' + format_shapes(
+            stats.top(settings.REQUEST_STATS_TOP_QUERIES)
+        )
+        logger.warning(message)
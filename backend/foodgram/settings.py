@@ -1,3 +1,4 @@
+import math
 import os
 import environ
 
@@ -30,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.RequestStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,6 +72,29 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.environ.get(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
+    },
+    'responses': {
+        'BACKEND': os.environ.get(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'responses'),
+    },
+}
+
+RESPONSE_CACHE_ENABLED = env.bool('RESPONSE_CACHE_ENABLED', True)
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', 300)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -80,22 +105,76 @@ LOGGING = {
     },
     'root': {
         'handlers': ['console'],
-        'level': 'DEBUG',
+        'level': os.environ.get('LOG_LEVEL', 'INFO'),
+    },
+    'loggers': {
+        # Logs every statement at DEBUG; RequestStatsMiddleware reports
+        # per-request summaries instead.
+        'django.db.backends': {
+            'level': os.environ.get('DB_LOG_LEVEL', 'INFO'),
+        },
     },
 }
 
+REQUEST_STATS_ENABLED = env.bool('REQUEST_STATS_ENABLED', True)
+# Server-Timing exposes query counts and timings to every client.
+REQUEST_STATS_HEADER = env.bool('REQUEST_STATS_HEADER', DEBUG)
+REQUEST_STATS_SLOW_MS = env.float('REQUEST_STATS_SLOW_MS', 500)
+REQUEST_STATS_REPEATED = env.int('REQUEST_STATS_REPEATED', 10)
+REQUEST_STATS_SAMPLE_RATE = env.float('REQUEST_STATS_SAMPLE_RATE', 0.1)
+REQUEST_STATS_TOP_QUERIES = env.int('REQUEST_STATS_TOP_QUERIES', 5)
+
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'backend_static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'backend_media')
 
+# PostgreSQL text search configuration. 'simple' does no stemming, so it
+# suits any language; set e.g. 'russian' to stem. Stored vectors use the
+# configuration they were built with: run rebuild_search_index after
+# changing it.
+SEARCH_CONFIG = os.environ.get('SEARCH_CONFIG', 'simple')
+
+FEED_FANOUT_MAX_FOLLOWERS = env.int('FEED_FANOUT_MAX_FOLLOWERS', 10000)
+FEED_BACKFILL = env.int('FEED_BACKFILL', 50)
+FEED_BATCH_SIZE = env.int('FEED_BATCH_SIZE', 500)
+FEED_WORKERS = env.int('FEED_WORKERS', 2)
+
+COVERAGE_INDEX_MAX_AGE = env.int('COVERAGE_INDEX_MAX_AGE', 3600)
+COVERAGE_INDEX_CHANGE_RETENTION = env.int(
+    'COVERAGE_INDEX_CHANGE_RETENTION', 24 * 3600
+)
+
+IMAGE_WORKERS = env.int('IMAGE_WORKERS', 2)
+IMAGE_VARIANT_QUALITY = env.int('IMAGE_VARIANT_QUALITY', 80)
+IMAGE_MAX_UPLOAD_BYTES = env.int('IMAGE_MAX_UPLOAD_BYTES', 5 * 1024 * 1024)
+IMAGE_MAX_DIMENSION = env.int('IMAGE_MAX_DIMENSION', 6000)
+IMAGE_MAX_PIXELS = env.int('IMAGE_MAX_PIXELS', 24000000)
+# Images arrive base64-encoded inside JSON bodies, which Django reads into
+# memory: 4/3 of the largest image plus room for the rest of the recipe.
+DATA_UPLOAD_MAX_MEMORY_SIZE = env.int(
+    'DATA_UPLOAD_MAX_MEMORY_SIZE',
+    math.ceil(IMAGE_MAX_UPLOAD_BYTES * 4 / 3) + 1024 * 1024,
+)
+
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 DEFAULT_FROM_EMAIL = 'admin@yamdb.com'
-EXTERNAL_API_URL = 'http://grocery:8080/'
+EXTERNAL_API_URL = os.environ.get('EXTERNAL_API_URL', 'http://grocery:8080/')
+EXTERNAL_API_CONNECT_TIMEOUT = env.float('EXTERNAL_API_CONNECT_TIMEOUT', 3.05)
+EXTERNAL_API_READ_TIMEOUT = env.float('EXTERNAL_API_READ_TIMEOUT', 10)
+EXTERNAL_API_MAX_RETRIES = env.int('EXTERNAL_API_MAX_RETRIES', 2)
+EXTERNAL_API_BACKOFF = env.float('EXTERNAL_API_BACKOFF', 0.2)
+EXTERNAL_API_POOL_SIZE = env.int('EXTERNAL_API_POOL_SIZE', 10)
+EXTERNAL_API_BREAKER_THRESHOLD = env.int('EXTERNAL_API_BREAKER_THRESHOLD', 5)
+EXTERNAL_API_BREAKER_RESET = env.float('EXTERNAL_API_BREAKER_RESET', 30)
+
+CHECKOUT_MAX_ATTEMPTS = env.int('CHECKOUT_MAX_ATTEMPTS', 5)
+CHECKOUT_RETRY_DELAY = env.int('CHECKOUT_RETRY_DELAY', 30)
+CHECKOUT_STALE_AFTER = env.int('CHECKOUT_STALE_AFTER', 300)
 
 AI_SUGGESTION_PROMPT_TEMPLATE = (
     "Based on the following ingredients: {ingredients}, suggest a recipe that is well-known or widely recognized "
@@ -110,6 +189,14 @@ AI_SUGGESTION_PROMPT_TEMPLATE = (
 )
 
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+AI_SUGGESTION_PROVIDER = os.environ.get(
+    'AI_SUGGESTION_PROVIDER', 'recipes.suggestions.OpenAIProvider'
+)
+AI_SUGGESTION_MODEL = os.environ.get('AI_SUGGESTION_MODEL', 'gpt-3.5-turbo')
+AI_SUGGESTION_TIMEOUT = env.float('AI_SUGGESTION_TIMEOUT', 20)
+AI_SUGGESTION_CACHE_SIZE = env.int('AI_SUGGESTION_CACHE_SIZE', 512)
+AI_SUGGESTION_CACHE_TTL = env.int('AI_SUGGESTION_CACHE_TTL', 3600)
+AI_SUGGESTION_WORKERS = env.int('AI_SUGGESTION_WORKERS', 4)
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+SECRET_KEY = 'test-secret-key'
+
+# PostgreSQL-only behaviour is tested when DB_ENGINE points at it.
+if not os.environ.get('DB_ENGINE'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+    },
+}
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram-media-')
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+REQUEST_STATS_SAMPLE_RATE = 0
@@ -0,0 +1,188 @@
+import gc
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from users.models import CustomUser
+
+from .generator import FixtureGenerator, get_writer
+from .models import Ingredient, IngredientsRecipe, Recipe, Tag
+from .search import refresh_search_index
+from .similarity import compute_similar_recipes
+
+# Keyword arguments of FixtureGenerator.generate.
+DATASETS = {
+    'small': {
+        'users': 50, 'recipes': 500, 'tags': 8, 'ingredients_per_recipe': 8,
+        'follows': 10, 'favorites': 20, 'cart': 10,
+    },
+    'medium': {
+        'users': 500, 'recipes': 5000, 'tags': 12,
+        'ingredients_per_recipe': 10, 'follows': 30, 'favorites': 50,
+        'cart': 20,
+    },
+    'large': {
+        'users': 2000, 'recipes': 20000, 'tags': 16,
+        'ingredients_per_recipe': 12, 'follows': 50, 'favorites': 100,
+        'cart': 30,
+    },
+}
+
+# (name, URL name, URL kwargs, query string, authenticated)
+ENDPOINTS = (
+    ('recipes', 'recipes-list', {}, '', False),
+    ('recipes_filtered', 'recipes-list', {},
+     'tags={tag}&is_favorited=1', True),
+    ('recipes_search', 'recipes-list', {}, 'search={word}', False),
+    ('recipe', 'recipes-detail', {'pk': '{recipe}'}, '', True),
+    ('similar', 'recipes-similar', {'pk': '{recipe}'}, '', False),
+    ('what_can_i_cook', 'recipes-what-can-i-cook', {},
+     'ingredients={pantry}', False),
+    ('feed', 'recipes-feed', {}, '', True),
+    ('download_shopping_cart', 'recipes-download-shopping-cart', {}, '',
+     True),
+    ('ingredients', 'ingredients-list', {}, 'name={prefix}', False),
+    ('tags', 'tags-list', {}, '', False),
+    ('users', 'users-list', {}, '', True),
+    ('me', 'users-me', {}, '', True),
+    ('subscriptions', 'subscriptions', {}, '', True),
+)
+
+# Latencies are stored as multiples of this endpoint's p50 measured in
+# the same run, so that a baseline recorded on one machine carries over
+# to another within the threshold.
+REFERENCE_ENDPOINT = 'tags'
+# Relative latency and memory may grow this much on top of the threshold
+# before a run fails; the slack absorbs timer noise on fast endpoints.
+LATENCY_SLACK = 0.5
+PEAK_SLACK_KB = 64.0
+BASELINE_PATH = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+BATCH_SIZE = 2000
+
+
+def seed(dataset, seed=0):
+    """
+    Fill an empty database with a dataset from DATASETS; returns the
+    values the endpoint URLs are formatted with.
+    """
+    FixtureGenerator(get_writer(BATCH_SIZE), seed=seed).generate(
+        **DATASETS[dataset]
+    )
+    refresh_search_index(Recipe.objects.values_list('pk', flat=True))
+    compute_similar_recipes(top_n=20, max_products=2000000, full=True)
+    pantry = IngredientsRecipe.objects.values('ingredient').annotate(
+        uses=Count('pk')
+    ).order_by('-uses', 'ingredient').values_list('ingredient', flat=True)
+    return {
+        # The most active user and the most popular recipe, so that
+        # every per-user page has something on it.
+        'user': CustomUser.objects.annotate(
+            follows=Count('follower')
+        ).order_by('-follows', 'pk').first(),
+        'recipe': Recipe.objects.order_by('-favorites_count', 'pk').first().pk,
+        'tag': Tag.objects.order_by('pk').first().slug,
+        'word': Recipe.objects.order_by('pk').first().name.split()[0],
+        'prefix': Ingredient.objects.order_by('pk').first().name[:2],
+        'pantry': ','.join(map(str, pantry[:10])),
+    }
+
+
+def endpoint_url(name, kwargs, query, values):
+    url = reverse(name, kwargs={
+        key: value.format(**values) for key, value in kwargs.items()
+    })
+    query = query.format(**values)
+    return f'{url}?{query}' if query else url
+
+
+def request(client, url):
+    response = client.get(url)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    if response.status_code != 200:
+        raise AssertionError(f'GET {url} returned {response.status_code}')
+    return response
+
+
+def measure(client, url, runs):
+    """Return p50/p95 latency, query count and peak allocation of a GET."""
+    request(client, url)
+    timings, queries = [], 0
+    # A collection landing inside one request would show up as latency.
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(runs):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                request(client, url)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = max(queries, len(context.captured_queries))
+    finally:
+        gc.enable()
+    # Allocation tracing slows every call down, so it gets its own run.
+    tracemalloc.start()
+    try:
+        request(client, url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'p50_ms': round(float(np.percentile(timings, 50)), 3),
+        'p95_ms': round(float(np.percentile(timings, 95)), 3),
+        'queries': queries,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def normalize(metrics, reference_ms):
+    """Express the latencies of `metrics` in multiples of `reference_ms`."""
+    return {
+        'p50': round(metrics['p50_ms'] / reference_ms, 2),
+        'p95': round(metrics['p95_ms'] / reference_ms, 2),
+        'queries': metrics['queries'],
+        'peak_kb': metrics['peak_kb'],
+    }
+
+
+def compare(name, result, base, threshold):
+    """Return a message for every metric of `result` that regressed."""
+    regressions = []
+    if result['queries'] > base['queries']:
+        regressions.append(
+            f'{name}: {result["queries"]} queries, '
+            f'baseline {base["queries"]}'
+        )
+    for metric, slack in (
+        ('p50', LATENCY_SLACK),
+        ('p95', LATENCY_SLACK),
+        ('peak_kb', PEAK_SLACK_KB),
+    ):
+        if result[metric] > base[metric] * (1 + threshold) + slack:
+            regressions.append(
+                f'{name}: {metric} {result[metric]}, '
+                f'baseline {base[metric]}'
+            )
+    return regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path) as baseline:
+            return json.load(baseline)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, baseline):
+    with open(path, 'w') as output:
+        json.dump(baseline, output, indent=2, sort_keys=True)
+        output.write('\n')
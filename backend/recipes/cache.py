@@ -0,0 +1,122 @@
+import hashlib
+import threading
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from rest_framework.response import Response
+
+GENERATION_KEY = 'generation:{0}'
+
+
+def get_generations(resources):
+    """
+    Return the current generation stamp of each resource.
+
+    Stamps live in the default cache so that every worker sharing it sees
+    a bump; a missing stamp is simply re-created, which only costs a miss.
+    """
+    keys = [GENERATION_KEY.format(resource) for resource in resources]
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            stamps[key] = uuid.uuid4().hex
+            cache.add(key, stamps[key], None)
+            stamps[key] = cache.get(key, stamps[key])
+    return [stamps[key] for key in keys]
+
+
+def get_generation(resource):
+    return get_generations([resource])[0]
+
+
+def bump_generation(*resources):
+    cache.set_many(
+        {GENERATION_KEY.format(resource): uuid.uuid4().hex
+         for resource in resources},
+        None
+    )
+
+
+class CacheStats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+response_cache_stats = CacheStats()
+
+
+def response_cache_key(request, resources):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    generations = ':'.join(get_generations(resources))
+    digest = hashlib.md5(
+        f'{request.get_host()}{request.path}?{query}'.encode()
+    ).hexdigest()
+    return f'response:{digest}:{generations}'
+
+
+class CachedResponseMixin:
+    """
+    Serve anonymous list/retrieve responses from the `responses` cache.
+
+    Keys include the generation of every resource in `cache_resources`,
+    so a bump from the model signals makes all older pages unreachable
+    instead of serving them stale.
+    """
+    cache_resources = ()
+
+    def is_cacheable(self, request):
+        return True
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if (
+            not settings.RESPONSE_CACHE_ENABLED
+            or not request.user.is_anonymous
+            or not self.is_cacheable(request)
+        ):
+            return handler(request, *args, **kwargs)
+        response_cache = caches[settings.RESPONSE_CACHE_ALIAS]
+        key = response_cache_key(request, self.cache_resources)
+        data = response_cache.get(key)
+        response_cache_stats.record(hit=data is not None)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response_cache.set(
+                key, response.data, settings.RESPONSE_CACHE_TIMEOUT
+            )
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
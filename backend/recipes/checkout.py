@@ -0,0 +1,105 @@
+import json
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .external_api import get_grocery_service
+from .models import CheckoutJob
+from .utils import get_shopping_list_items
+
+logger = logging.getLogger(__name__)
+
+
+def get_checkout_items(user):
+    return [
+        {
+            'name': item['ingredient__name'],
+            'quantity': item['amount'],
+            'unit': item['ingredient__measurement_unit'],
+        }
+        for item in get_shopping_list_items(user)
+    ]
+
+
+def enqueue_checkout(user, items, idempotency_key=None):
+    """
+    Record a checkout job and return it.
+
+    A repeated request with the same idempotency key returns the job that
+    was created first instead of queueing a second order.
+    """
+    key = idempotency_key or str(uuid.uuid4())
+    try:
+        with transaction.atomic():
+            return CheckoutJob.objects.create(
+                user=user, idempotency_key=key, items=json.dumps(items)
+            )
+    except IntegrityError:
+        return CheckoutJob.objects.get(user=user, idempotency_key=key)
+
+
+def claim_jobs(batch_size):
+    """
+    Mark up to `batch_size` jobs as processing and return them.
+
+    Failed attempts are retried after CHECKOUT_RETRY_DELAY seconds, and
+    jobs left in processing by a crashed worker are picked up again once
+    CHECKOUT_STALE_AFTER seconds have passed.
+    """
+    now = timezone.now()
+    retry = now - timedelta(seconds=settings.CHECKOUT_RETRY_DELAY)
+    stale = now - timedelta(seconds=settings.CHECKOUT_STALE_AFTER)
+    with transaction.atomic():
+        ids = list(
+            CheckoutJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status=CheckoutJob.PENDING, claimed_at__isnull=True)
+                | Q(status=CheckoutJob.PENDING, claimed_at__lt=retry)
+                | Q(status=CheckoutJob.PROCESSING, claimed_at__lt=stale)
+            )
+            .order_by('created')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        CheckoutJob.objects.filter(pk__in=ids).update(
+            status=CheckoutJob.PROCESSING,
+            claimed_at=now,
+            attempts=F('attempts') + 1,
+        )
+    return list(CheckoutJob.objects.filter(pk__in=ids))
+
+
+def process_job(job, service=None):
+    service = service or get_grocery_service()
+    # The job id doubles as the idempotency key, so a job retried after a
+    # lost response resolves to the order that was already created.
+    response = service.create_shopping_list(
+        json.loads(job.items), idempotency_key=str(job.pk)
+    )
+    job.finished_at = timezone.now()
+    if 'error' not in response:
+        job.status = CheckoutJob.DONE
+        job.order_uuid = response.get('order_uuid', '')
+        job.error = ''
+    elif job.attempts >= settings.CHECKOUT_MAX_ATTEMPTS:
+        job.status = CheckoutJob.FAILED
+        job.error = response['error']
+    else:
+        job.status = CheckoutJob.PENDING
+        job.error = response['error']
+        job.finished_at = None
+    job.save(update_fields=['status', 'order_uuid', 'error', 'finished_at'])
+    logger.info('Checkout job %s: %s', job.pk, job.status)
+    return job
+
+
+def process_batch(batch_size, service=None):
+    jobs = claim_jobs(batch_size)
+    for job in jobs:
+        process_job(job, service)
+    return len(jobs)
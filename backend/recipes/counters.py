@@ -0,0 +1,55 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import CustomUser, Follow
+
+from .models import FavoriteRecipe, Recipe, ShoppingCart
+
+# (model holding the counter, counter field, counted model, FK to the holder)
+COUNTERS = (
+    (Recipe, 'favorites_count', FavoriteRecipe, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (CustomUser, 'recipes_count', Recipe, 'author'),
+    (CustomUser, 'followers_count', Follow, 'author'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """Atomically add `delta` to a counter column without reading it."""
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def count_instance(instance, delta):
+    """Add `delta` to every counter that counts rows like `instance`."""
+    for model, field, counted_model, fk in COUNTERS:
+        if isinstance(instance, counted_model):
+            change_counter(model, getattr(instance, f'{fk}_id'), field, delta)
+
+
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects
+        .filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    ), 0)
+
+
+def recount(counters=COUNTERS):
+    """Repair every counter column; returns {counter: rows that drifted}."""
+    drifted = {}
+    for model, field, counted_model, fk in counters:
+        actual = count_subquery(counted_model, fk)
+        drifted[f'{model.__name__}.{field}'] = (
+            model.objects
+            .annotate(actual=actual)
+            .exclude(**{field: F('actual')})
+            .count()
+        )
+        model.objects.update(**{field: actual})
+    return drifted
@@ -0,0 +1,260 @@
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import get_generation
+from .models import IngredientsRecipe, RecipeChange
+
+# Changes committed out of id order are caught by re-reading this many
+# ids below the cursor; replaying a change twice is harmless.
+CHANGE_LOOKBACK = 256
+# Rebuild once this share of the slots belongs to replaced recipes.
+MAX_DEAD_RATIO = 0.25
+MAX_MISSING = 0x7FFF
+
+EMPTY_POSITIONS = np.empty(0, dtype=np.int32)
+
+
+def record_recipe_changes(recipe_ids):
+    """Log written or deleted recipes in the current transaction."""
+    RecipeChange.objects.bulk_create(
+        RecipeChange(recipe_id=recipe_id) for recipe_id in recipe_ids
+    )
+
+
+def prune_recipe_changes(retention=None):
+    """
+    Delete change log entries older than `retention` seconds; returns
+    how many were deleted.
+
+    Indexes are rebuilt every COVERAGE_INDEX_MAX_AGE seconds, so entries
+    older than that are never replayed again.
+    """
+    if retention is None:
+        retention = settings.COVERAGE_INDEX_CHANGE_RETENTION
+    deleted, _ = RecipeChange.objects.filter(
+        created__lt=timezone.now() - timedelta(seconds=retention)
+    ).delete()
+    return deleted
+
+
+class CoverageState:
+    """
+    One immutable snapshot of the index.
+
+    Every recipe occupies a slot; `postings` maps an ingredient id to the
+    sorted slots of the recipes that use it. A rewritten recipe gets a
+    new slot and its old one is marked dead, so snapshots are never
+    mutated after they are published.
+    """
+
+    def __init__(self, recipe_ids, ingredients, postings, alive,
+                 generation, cursor, applied, built_at):
+        self.recipe_ids = recipe_ids
+        self.ingredients = ingredients
+        self.totals = np.fromiter(
+            (len(items) for items in ingredients), dtype=np.int64,
+            count=len(ingredients),
+        )
+        self.postings = postings
+        self.alive = alive
+        self.slots = {
+            recipe_id: slot
+            for slot, recipe_id in enumerate(recipe_ids.tolist())
+            if alive[slot]
+        }
+        self.generation = generation
+        self.cursor = cursor
+        self.applied = applied
+        self.built_at = built_at
+
+    @property
+    def dead_ratio(self):
+        if not len(self.alive):
+            return 0.0
+        return 1 - np.count_nonzero(self.alive) / len(self.alive)
+
+
+def load_rows(recipe_ids=None):
+    """Return {recipe_id: sorted ingredient ids} from the through table."""
+    rows = IngredientsRecipe.objects.order_by('recipe_id', 'ingredient_id')
+    if recipe_ids is not None:
+        rows = rows.filter(recipe_id__in=recipe_ids)
+    grouped = {}
+    for recipe_id, ingredient_id in rows.values_list(
+        'recipe_id', 'ingredient_id'
+    ).iterator():
+        grouped.setdefault(recipe_id, []).append(ingredient_id)
+    return grouped
+
+
+class RecipeCoverageIndex:
+    """
+    Inverted index of recipe ingredients for "what can I cook" queries.
+
+    Each process builds the index from IngredientsRecipe once, then
+    replays RecipeChange entries whenever the `recipes` generation moves,
+    reloading only the recipes that were written. Ranking is a bincount
+    over the posting lists of the pantry ingredients, so a query touches
+    only the recipes sharing at least one ingredient with it.
+    """
+
+    def __init__(self):
+        self.state = None
+        self.lock = threading.Lock()
+
+    def build(self, generation):
+        # Rows are read after the cursor, so they already include the
+        # latest changes; those are marked applied instead of replayed.
+        recent = list(RecipeChange.objects.order_by('-id').values_list(
+            'id', flat=True
+        )[:CHANGE_LOOKBACK])
+        cursor = recent[0] if recent else 0
+        grouped = load_rows()
+        recipe_ids = np.fromiter(grouped, dtype=np.int64, count=len(grouped))
+        ingredients = [tuple(items) for items in grouped.values()]
+        slots = np.repeat(
+            np.arange(len(ingredients), dtype=np.int32),
+            [len(items) for items in ingredients],
+        )
+        flat = np.fromiter(
+            (ingredient for items in ingredients for ingredient in items),
+            dtype=np.int64, count=len(slots),
+        )
+        order = np.argsort(flat, kind='stable')
+        keys, starts = np.unique(flat[order], return_index=True)
+        postings = dict(zip(
+            keys.tolist(), np.split(slots[order], starts[1:])
+        )) if len(keys) else {}
+        return CoverageState(
+            recipe_ids, ingredients, postings,
+            np.ones(len(ingredients), dtype=bool),
+            generation, cursor, frozenset(recent), time.monotonic(),
+        )
+
+    def apply_changes(self, state, generation):
+        changes = list(RecipeChange.objects.filter(
+            id__gt=state.cursor - CHANGE_LOOKBACK
+        ).values_list('id', 'recipe_id'))
+        pending = [
+            (change_id, recipe_id) for change_id, recipe_id in changes
+            if change_id not in state.applied
+        ]
+        cursor = max([state.cursor, *(change_id for change_id, _ in changes)])
+        applied = frozenset(
+            change_id for change_id, _ in changes
+            if change_id > cursor - CHANGE_LOOKBACK
+        )
+        if not pending:
+            return CoverageState(
+                state.recipe_ids, state.ingredients, state.postings,
+                state.alive, generation, cursor, applied, state.built_at,
+            )
+        changed = {recipe_id for _, recipe_id in pending}
+        grouped = load_rows(changed)
+        alive = state.alive.copy()
+        for recipe_id in changed:
+            if recipe_id in state.slots:
+                alive[state.slots[recipe_id]] = False
+        first_slot = len(state.ingredients)
+        added = [tuple(items) for items in grouped.values()]
+        recipe_ids = np.concatenate([
+            state.recipe_ids,
+            np.fromiter(grouped, dtype=np.int64, count=len(grouped)),
+        ])
+        new_postings = {}
+        for offset, items in enumerate(added):
+            for ingredient_id in items:
+                new_postings.setdefault(ingredient_id, []).append(
+                    first_slot + offset
+                )
+        postings = dict(state.postings)
+        for ingredient_id, slots in new_postings.items():
+            postings[ingredient_id] = np.concatenate([
+                postings.get(ingredient_id, EMPTY_POSITIONS),
+                np.array(slots, dtype=np.int32),
+            ])
+        return CoverageState(
+            recipe_ids, state.ingredients + added, postings,
+            np.concatenate([alive, np.ones(len(added), dtype=bool)]),
+            generation, cursor, applied, state.built_at,
+        )
+
+    def current(self):
+        generation = get_generation('recipes')
+        state = self.state
+        if state is not None and state.generation == generation:
+            return state
+        with self.lock:
+            state = self.state
+            if state is None or (
+                time.monotonic() - state.built_at
+                > settings.COVERAGE_INDEX_MAX_AGE
+            ):
+                state = self.build(generation)
+            elif state.generation != generation:
+                state = self.apply_changes(state, generation)
+                if state.dead_ratio > MAX_DEAD_RATIO:
+                    state = self.build(generation)
+            # Swapped in whole, so readers never see a half-applied change.
+            self.state = state
+        return state
+
+    def rank(self, ingredient_ids, limit, max_missing=None):
+        """
+        Return up to `limit` (recipe_id, covered, missing, missing_ids)
+        tuples: fewest missing ingredients first, then most covered, then
+        newest.
+        """
+        state = self.current()
+        pantry = set(ingredient_ids)
+        lists = [
+            state.postings[ingredient_id] for ingredient_id in pantry
+            if ingredient_id in state.postings
+        ]
+        if not lists or limit <= 0:
+            return []
+        covered = np.bincount(
+            np.concatenate(lists), minlength=len(state.alive)
+        )
+        covered[~state.alive] = 0
+        candidates = np.flatnonzero(covered)
+        covered = covered[candidates]
+        missing = state.totals[candidates] - covered
+        if max_missing is not None:
+            keep = missing <= max_missing
+            candidates, covered, missing = (
+                candidates[keep], covered[keep], missing[keep]
+            )
+        if not len(candidates):
+            return []
+        keys = (
+            (np.minimum(missing, MAX_MISSING) << 48)
+            | ((0xFFFF - np.minimum(covered, 0xFFFF)) << 32)
+            | (0xFFFFFFFF - state.recipe_ids[candidates])
+        )
+        if len(keys) > limit:
+            top = np.argpartition(keys, limit - 1)[:limit]
+        else:
+            top = np.arange(len(keys))
+        top = top[np.argsort(keys[top])]
+        return [
+            (
+                int(state.recipe_ids[candidates[position]]),
+                int(covered[position]),
+                int(missing[position]),
+                [
+                    ingredient_id
+                    for ingredient_id in state.ingredients[candidates[position]]
+                    if ingredient_id not in pantry
+                ],
+            )
+            for position in top
+        ]
+
+
+coverage_index = RecipeCoverageIndex()
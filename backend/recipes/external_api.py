@@ -1,17 +1,207 @@
+import logging
+import random
+import threading
+import time
+
 import requests
 from django.conf import settings
-import logging
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
-class ExternalGroceryService:
+RETRY_STATUS_CODES = (502, 503, 504)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without touching the network while the breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and lets a single
+    probe request through once `reset_timeout` seconds have passed.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.state = self.CLOSED
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and (
+                time.monotonic() - self.opened_at >= self.reset_timeout
+            ):
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if (
+                self.state == self.HALF_OPEN
+                or self.failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class ServiceStats:
+    """Thread-safe request counters and latency totals."""
+
     def __init__(self):
-        self.base_url = settings.EXTERNAL_API_URL
+        self.lock = threading.Lock()
+        self.counters = {
+            'requests': 0,
+            'successes': 0,
+            'errors': 0,
+            'retries': 0,
+            'short_circuited': 0,
+        }
+        self.attempts = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def increment(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def observe(self, latency):
+        with self.lock:
+            self.attempts += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                **self.counters,
+                'latency_avg': (
+                    self.latency_total / self.attempts
+                    if self.attempts else 0.0
+                ),
+                'latency_max': self.latency_max,
+            }
+
+
+class ExternalGroceryService:
+    def __init__(self, base_url=None, session=None):
+        self.base_url = (base_url or settings.EXTERNAL_API_URL).rstrip('/')
         self.headers = {
             "Content-Type": "application/json",
         }
+        self.timeout = (
+            settings.EXTERNAL_API_CONNECT_TIMEOUT,
+            settings.EXTERNAL_API_READ_TIMEOUT,
+        )
+        self.max_retries = settings.EXTERNAL_API_MAX_RETRIES
+        self.backoff = settings.EXTERNAL_API_BACKOFF
+        self.session = session or self.build_session()
+        self.breaker = CircuitBreaker(
+            settings.EXTERNAL_API_BREAKER_THRESHOLD,
+            settings.EXTERNAL_API_BREAKER_RESET,
+        )
+        self.stats = ServiceStats()
+
+    @staticmethod
+    def build_session():
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.EXTERNAL_API_POOL_SIZE,
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def backoff_delay(self, attempt):
+        # "Full jitter": a random delay up to the exponential bound.
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def post(self, path, payload, headers=None):
+        """
+        POST `payload` and return the decoded JSON body.
+
+        Connection errors, timeouts and 502/503/504 responses are retried
+        up to `max_retries` times; any other error is raised at once.
+        Every call that passes the breaker reports its outcome to it, so a
+        half-open probe always closes or reopens the circuit.
+        """
+        url = f"{self.base_url}{path}"
+        headers = {**self.headers, **(headers or {})}
+        self.stats.increment('requests')
+        if not self.breaker.allow_request():
+            self.stats.increment('short_circuited')
+            raise CircuitOpenError(f"Circuit open for {self.base_url}")
+        try:
+            data = self.send(url, payload, headers)
+        except Exception as error:
+            self.stats.increment('errors')
+            # A 4xx is the caller's fault, not a sign of an unhealthy
+            # service.
+            response = getattr(error, 'response', None)
+            if response is not None and response.status_code < 500:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            raise
+        self.stats.increment('successes')
+        self.breaker.record_success()
+        return data
+
+    def send(self, url, payload, headers):
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                response = self.session.post(
+                    url, json=payload, headers=headers,
+                    timeout=self.timeout,
+                )
+                if response.status_code in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+                requests.exceptions.HTTPError,
+            ) as error:
+                self.stats.observe(time.monotonic() - started)
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.stats.increment('retries')
+                logger.warning(
+                    "Retrying %s (attempt %s): %s", url, attempt, error
+                )
+                time.sleep(self.backoff_delay(attempt))
+                continue
+            except requests.exceptions.RequestException:
+                self.stats.observe(time.monotonic() - started)
+                raise
+            self.stats.observe(time.monotonic() - started)
+            response.raise_for_status()
+            try:
+                return response.json()
+            except ValueError as error:
+                # A garbled body counts against the service.
+                raise requests.exceptions.RequestException(error)
 
-    def create_shopping_list(self, items):
+    def create_shopping_list(self, items, idempotency_key=None):
         """
         Sends a shopping list to the external grocery service.
 
@@ -21,22 +211,34 @@ class ExternalGroceryService:
 
         Returns:
             dict: Response from the external service (or mock response).
+
+        Retries of the same order must pass the same `idempotency_key` so the
+        service can return the original order instead of creating another.
         """
-        url = f"{self.base_url}/api/shopping-cart"
-        print(url)
         payload = {"items": items}
-
+        headers = (
+            {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        )
         try:
-            logger.info("Sending request to external API: %s", url)
-            logger.info("Payload: %s", payload)
-
-            response = requests.post(url, json=payload, headers=self.headers)
-            response.raise_for_status()  # Raise HTTPError for bad responses (4xx, 5xx)
-
-            logger.info("External API response: %s", response.json())
-            return response.json()
-
+            logger.info("Sending %s items to the external API", len(items))
+            data = self.post("/api/shopping-cart", payload, headers)
+            logger.info("External API response: %s", data)
+            return data
         except requests.exceptions.RequestException as e:
             # Log the error and return a failure message
             logger.error("Error interacting with the external grocery service: %s", e)
             return {"error": "Failed to create shopping list in the external service"}
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_grocery_service():
+    """Return the process-wide, connection-pooled grocery service client."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = ExternalGroceryService()
+    return _service
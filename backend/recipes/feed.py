@@ -0,0 +1,182 @@
+import heapq
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+
+from users.models import CustomUser, Follow
+
+from .models import FeedEntry, Recipe
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.FEED_WORKERS,
+            thread_name_prefix='feed-fan-out',
+        )
+    return _executor
+
+
+def is_popular(author):
+    return author.followers_count >= settings.FEED_FANOUT_MAX_FOLLOWERS
+
+
+def write_entries(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=settings.FEED_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def latest_recipes(author_id):
+    return Recipe.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:settings.FEED_BACKFILL]
+
+
+def write_to_followers(author_id, recipes):
+    """Write (recipe_id, pub_date) pairs into every follower's timeline."""
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True).iterator()
+    while True:
+        batch = list(islice(followers, settings.FEED_BATCH_SIZE))
+        if not batch:
+            break
+        write_entries(
+            FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                      author_id=author_id, pub_date=pub_date)
+            for user_id in batch
+            for recipe_id, pub_date in recipes
+        )
+
+
+def fan_out(recipe_id):
+    """Write a recipe into the timeline of every follower of its author."""
+    close_old_connections()
+    try:
+        recipe = Recipe.objects.select_related('author').only(
+            'id', 'pub_date', 'author_id', 'author__followers_count'
+        ).filter(pk=recipe_id).first()
+        if recipe is None or is_popular(recipe.author):
+            return
+        write_to_followers(
+            recipe.author_id, [(recipe.pk, recipe.pub_date)]
+        )
+    except Exception:
+        logger.exception('Could not fan out recipe %s', recipe_id)
+    finally:
+        close_old_connections()
+
+
+def backfill_followers(author_id):
+    """
+    Copy the latest recipes of an author who is no longer popular into
+    the timeline of every follower.
+
+    Recipes posted while the author was popular were never fanned out,
+    and read_feed stops merging them in once the author drops below
+    FEED_FANOUT_MAX_FOLLOWERS. As with a new follow, only the latest
+    FEED_BACKFILL recipes are copied.
+    """
+    close_old_connections()
+    try:
+        write_to_followers(author_id, list(latest_recipes(author_id)))
+    except Exception:
+        logger.exception('Could not backfill followers of %s', author_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_fan_out(recipe):
+    """Fan the recipe out in the worker pool once the transaction commits."""
+    recipe_id = recipe.pk
+    transaction.on_commit(
+        lambda: get_executor().submit(fan_out, recipe_id)
+    )
+
+
+def schedule_backfill(author_id):
+    """
+    Backfill the followers once the author has just dropped below the
+    fan-out threshold; call after the follower count was decremented.
+
+    Counters move one unfollow at a time under a row lock, so exactly one
+    unfollow sees the count right below the threshold.
+    """
+    followers_count = CustomUser.objects.filter(pk=author_id).values_list(
+        'followers_count', flat=True
+    ).first()
+    if followers_count != settings.FEED_FANOUT_MAX_FOLLOWERS - 1:
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(backfill_followers, author_id)
+    )
+
+
+def follow_author(user, author):
+    """Copy the author's latest recipes into a new follower's timeline."""
+    if is_popular(author):
+        return
+    write_entries(
+        FeedEntry(user=user, recipe_id=recipe_id, author=author,
+                  pub_date=pub_date)
+        for recipe_id, pub_date in latest_recipes(author.pk)
+    )
+
+
+def unfollow_author(user, author):
+    FeedEntry.objects.filter(user=user, author=author).delete()
+
+
+def before(position, date_field, id_field):
+    pub_date, recipe_id = position
+    return Q(**{f'{date_field}__lt': pub_date}) | Q(**{
+        date_field: pub_date, f'{id_field}__lt': recipe_id
+    })
+
+
+def read_feed(user, position, size):
+    """
+    Return up to `size` (pub_date, recipe_id) pairs older than `position`,
+    newest first.
+
+    The timeline is read through the (user, -pub_date, -recipe) index;
+    recipes of followed popular authors are never fanned out, so they are
+    fetched by author and merged in. Entries written before an author
+    became popular may appear in both sources and are only kept once.
+    """
+    timeline = FeedEntry.objects.filter(user=user)
+    popular_authors = list(Follow.objects.filter(
+        user=user,
+        author__followers_count__gte=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).values_list('author_id', flat=True))
+    if position is not None:
+        timeline = timeline.filter(before(position, 'pub_date', 'recipe_id'))
+    sources = [timeline.order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id'
+    )[:size]]
+    if popular_authors:
+        recipes = Recipe.objects.filter(author_id__in=popular_authors)
+        if position is not None:
+            recipes = recipes.filter(before(position, 'pub_date', 'id'))
+        sources.append(recipes.order_by('-pub_date', '-id').values_list(
+            'pub_date', 'id'
+        )[:size])
+    merged = heapq.merge(*(list(rows) for rows in sources), reverse=True)
+    rows, seen = [], set()
+    for pub_date, recipe_id in merged:
+        if recipe_id not in seen:
+            seen.add(recipe_id)
+            rows.append((pub_date, recipe_id))
+            if len(rows) == size:
+                break
+    return rows
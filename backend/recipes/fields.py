@@ -0,0 +1,107 @@
+import base64
+import binascii
+import hashlib
+import os
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from PIL import Image
+from rest_framework import serializers
+
+# A multiple of 4, so every slice of the payload decodes on its own.
+DECODE_CHUNK = 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
+IMAGE_EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+
+
+class HashedBase64ImageField(serializers.FileField):
+    """
+    Base64 image field that never holds the decoded image in memory.
+
+    The payload is decoded slice by slice into a spooled temporary file
+    while it is hashed, the size limit is enforced before decoding, and
+    the dimensions are read from the image header without loading the
+    pixels. Files are named after their SHA-256, so uploading an image
+    that is already stored reuses the existing file.
+    """
+    default_error_messages = {
+        'invalid': 'Upload a valid base64 encoded image.',
+        'too_large': 'The image must not exceed {max_size} bytes.',
+        'too_many_pixels': (
+            'The image must not exceed {max_dimension}px per side '
+            'or {max_pixels} pixels in total.'
+        ),
+        'format': 'Supported image formats: {formats}.',
+    }
+
+    def __init__(self, *args, upload_to='recipes/', **kwargs):
+        self.upload_to = upload_to
+        super().__init__(*args, **kwargs)
+
+    def decode(self, payload):
+        """Decode into a temporary file; returns (file, sha256 hexdigest)."""
+        if ';base64,' in payload[:100]:
+            payload = payload[payload.index(';base64,') + 8:]
+        max_size = settings.IMAGE_MAX_UPLOAD_BYTES
+        if len(payload) // 4 * 3 - payload[-2:].count('=') > max_size:
+            self.fail('too_large', max_size=max_size)
+        file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        digest = hashlib.sha256()
+        try:
+            for start in range(0, len(payload), DECODE_CHUNK):
+                chunk = base64.b64decode(
+                    payload[start:start + DECODE_CHUNK], validate=True
+                )
+                digest.update(chunk)
+                file.write(chunk)
+        except (binascii.Error, ValueError):
+            file.close()
+            self.fail('invalid')
+        file.seek(0)
+        return file, digest.hexdigest()
+
+    def inspect(self, file):
+        """Check format and dimensions from the header; returns extension."""
+        try:
+            image = Image.open(file)
+            width, height = image.size
+            image_format = image.format
+            image.verify()
+        except Exception:
+            self.fail('invalid')
+        if image_format not in IMAGE_EXTENSIONS:
+            self.fail('format', formats=', '.join(IMAGE_EXTENSIONS))
+        if (
+            max(width, height) > settings.IMAGE_MAX_DIMENSION
+            or width * height > settings.IMAGE_MAX_PIXELS
+        ):
+            self.fail(
+                'too_many_pixels',
+                max_dimension=settings.IMAGE_MAX_DIMENSION,
+                max_pixels=settings.IMAGE_MAX_PIXELS,
+            )
+        file.seek(0)
+        return IMAGE_EXTENSIONS[image_format]
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str) or not data:
+            self.fail('invalid')
+        file, digest = self.decode(data)
+        try:
+            extension = self.inspect(file)
+        except serializers.ValidationError:
+            file.close()
+            raise
+        filename = f'{digest}.{extension}'
+        existing = os.path.join(self.upload_to, filename)
+        if default_storage.exists(existing):
+            file.close()
+            return existing
+        return File(file, name=filename)
@@ -1,33 +1,64 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
 
-from .models import Recipe, Tag
+from .models import Recipe, Tag, TagsRecipe
+from .search import search_recipes
 
 
 class RecipeFilter(filters.FilterSet):
+    """
+    Every filter is a correlated EXISTS subquery rather than a join, so a
+    recipe matching several tags is still listed once, and each probe is
+    answered by the (tag, recipe) and (user, recipe) unique indexes.
+    """
     tags = filters.filters.ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
-        field_name='tags__slug',
         to_field_name='slug',
+        method='filter_tags',
     )
     author = filters.CharFilter(lookup_expr='exact')
-    is_in_shopping_cart = filters.BooleanFilter(
-        field_name='is_in_shopping_cart', method='filter'
-    )
-    is_favorited = filters.BooleanFilter(
-        field_name='is_favorited', method='filter'
-    )
+    is_in_shopping_cart = filters.BooleanFilter(method='filter_user_flag')
+    is_favorited = filters.BooleanFilter(method='filter_user_flag')
 
-    def filter(self, queryset, name, value):
-        if name == 'is_in_shopping_cart' and value:
-            queryset = queryset.filter(
-                shopping_cart__user=self.request.user
-            )
-        if name == 'is_favorited' and value:
-            queryset = queryset.filter(
-                favorite_recipes__user=self.request.user
-            )
-        return queryset
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.annotate(has_tags=Exists(TagsRecipe.objects.filter(
+            recipe=OuterRef('pk'), tag__in=value
+        ))).filter(has_tags=True)
+
+    def filter_user_flag(self, queryset, name, value):
+        if not value:
+            return queryset
+        if self.request.user.is_anonymous:
+            return queryset.none()
+        # The view already selects the flags as EXISTS subqueries;
+        # filtering on them reuses the expression in WHERE.
+        if name not in queryset.query.annotations:
+            queryset = queryset.with_user_flags(self.request.user)
+        return queryset.filter(**{name: True})
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_in_shopping_cart', 'is_favorited']
\ No newline at end of file
+        fields = ['author', 'tags', 'is_in_shopping_cart', 'is_favorited']
+
+
+class RecipeSearchFilter(BaseFilterBackend):
+    """
+    Full-text search over recipe names, texts and ingredient names.
+
+    Matches are ordered by relevance unless `?ordering=` is given, in
+    which case that ordering wins.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        terms = request.query_params.get(self.search_param, '').strip()
+        if not terms:
+            return queryset
+        queryset = search_recipes(queryset, terms)
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return queryset
+        return queryset.order_by('-search_rank', *view.ordering)
@@ -0,0 +1,349 @@
+import csv
+import io
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from users.models import CustomUser, Follow
+
+from .counters import recount
+from .coverage_index import record_recipe_changes
+from .models import (FavoriteRecipe, FeedEntry, Ingredient,
+                     IngredientsRecipe, Recipe, ShoppingCart, Tag,
+                     TagsRecipe)
+
+# Users or recipes whose rows are generated and written at a time; this
+# bounds memory whatever the totals are.
+CHUNK_SIZE = 5000
+# Each follow expands to up to FEED_BACKFILL feed entries.
+FEED_CHUNK_SIZE = 1000
+HISTORY_DAYS = 365
+TAG_COLORS = ('#E26C2D', '#49B64E', '#8775D2', '#F0C808', '#2F80ED')
+
+
+@contextmanager
+def keep_dates(model, fields):
+    """Stop auto_now_add from replacing the generated dates on insert."""
+    dated = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False) and field.attname in fields
+    ]
+    for field in dated:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in dated:
+            field.auto_now_add = True
+
+
+class BulkCreateWriter:
+    """Inserts rows with bulk_create, `batch_size` rows per statement."""
+
+    def __init__(self, batch_size):
+        # SQLite caps a compound INSERT at 500 rows, so Django sizes its
+        # batches there.
+        self.batch_size = None if connection.vendor == 'sqlite' else batch_size
+
+    def write(self, model, fields, rows):
+        with keep_dates(model, fields):
+            model.objects.bulk_create(
+                (model(**dict(zip(fields, row))) for row in rows),
+                batch_size=self.batch_size,
+            )
+
+
+class CopyWriter:
+    """Streams rows into PostgreSQL with COPY ... FROM STDIN, batch by batch."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+
+    def write(self, model, fields, rows):
+        columns = ', '.join(
+            connection.ops.quote_name(model._meta.get_field(field).column)
+            for field in fields
+        )
+        sql = (
+            f'COPY {connection.ops.quote_name(model._meta.db_table)} '
+            f'({columns}) FROM STDIN WITH (FORMAT csv)'
+        )
+        rows = iter(rows)
+        with connection.cursor() as cursor:
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                buffer = io.StringIO()
+                # None is written as an unquoted empty field, which COPY
+                # reads as NULL.
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+
+
+def get_writer(batch_size, use_copy=True):
+    if use_copy and connection.vendor == 'postgresql':
+        return CopyWriter(batch_size)
+    return BulkCreateWriter(batch_size)
+
+
+def zipf_weights(count, exponent):
+    weights = 1 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+
+class Popularity:
+    """
+    Draws items with Zipf-like probabilities.
+
+    Ranks are assigned to the items in random order, so the popular items
+    are spread over the id range instead of being the oldest rows.
+    """
+
+    def __init__(self, rng, items, exponent):
+        self.rng = rng
+        self.items = rng.permutation(np.asarray(items))
+        self.cumulative = np.cumsum(zipf_weights(len(self.items), exponent))
+
+    def draw(self, size):
+        positions = np.searchsorted(
+            self.cumulative, self.rng.random(size) * self.cumulative[-1],
+            side='right',
+        )
+        return self.items[np.minimum(positions, len(self.items) - 1)]
+
+
+def unique_pairs(owners, items):
+    """Drop repeated (owner, item) pairs, keeping the first of each."""
+    width = int(items.max(initial=0)) + 1
+    _, first = np.unique(owners * width + items, return_index=True)
+    first.sort()
+    return owners[first], items[first]
+
+
+def activity(rng, size, mean):
+    """Per-owner row counts: most owners have a few, some have many."""
+    if mean <= 0:
+        return np.zeros(size, dtype=np.int64)
+    return rng.geometric(1 / (mean + 1), size) - 1
+
+
+def new_ids(model, after):
+    return np.fromiter(
+        model.objects.filter(pk__gt=after).order_by('pk').values_list(
+            'pk', flat=True
+        ).iterator(),
+        dtype=np.int64,
+    )
+
+
+def random_ages(rng, size):
+    """`size` ages in seconds within HISTORY_DAYS, oldest first."""
+    return np.sort(rng.random(size))[::-1] * HISTORY_DAYS * 86400
+
+
+def to_dates(now, ages):
+    return [now - timedelta(seconds=age) for age in ages.tolist()]
+
+
+class FixtureGenerator:
+    """
+    Generates users, recipes and their interactions for scale testing.
+
+    Authors, recipes, followed authors and ingredients are drawn from
+    Zipf-like distributions, so a few of each collect most of the
+    activity, as they do in production. Rows are produced and written
+    per chunk of CHUNK_SIZE owners, so memory stays bounded by the chunk
+    plus one id per user and recipe.
+    """
+
+    def __init__(self, writer, seed=0, exponent=1.1, log=None):
+        self.writer = writer
+        self.rng = np.random.default_rng(seed)
+        self.exponent = exponent
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.counts = {}
+
+    def write(self, model, fields, rows):
+        with transaction.atomic():
+            self.writer.write(model, fields, rows)
+        name = model._meta.object_name
+        self.counts[name] = self.counts.get(name, 0) + len(rows)
+
+    def ensure_tags(self, count):
+        missing = count - Tag.objects.count()
+        if missing > 0:
+            start = (Tag.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+            Tag.objects.bulk_create(
+                Tag(name=f'Tag {number}', slug=f'tag-{number}',
+                    color=TAG_COLORS[number % len(TAG_COLORS)])
+                for number in range(start, start + missing)
+            )
+        return list(Tag.objects.values_list('pk', flat=True))
+
+    def create_users(self, count):
+        start = CustomUser.objects.aggregate(last=Max('pk'))['last'] or 0
+        password = make_password(None)
+        fields = (
+            'username', 'email', 'password', 'first_name', 'last_name',
+            'role', 'is_superuser', 'is_staff', 'is_active', 'date_joined',
+            'recipes_count', 'followers_count',
+        )
+        # Numbered past the current largest id, so reruns never collide.
+        for first in range(0, count, CHUNK_SIZE):
+            numbers = range(start + first + 1,
+                            start + min(first + CHUNK_SIZE, count) + 1)
+            self.write(CustomUser, fields, [
+                (f'fixture{number}', f'fixture{number}@example.com',
+                 password, 'Fixture', f'User {number}', CustomUser.ROLE_USER,
+                 False, False, True, self.now, 0, 0)
+                for number in numbers
+            ])
+        return new_ids(CustomUser, start)
+
+    def create_recipes(self, count, authors, ingredients):
+        start = Recipe.objects.aggregate(last=Max('pk'))['last'] or 0
+        names = dict(Ingredient.objects.values_list('pk', 'name'))
+        fields = (
+            'name', 'text', 'image', 'has_image_variants', 'author_id',
+            'cooking_time', 'pub_date', 'favorites_count', 'in_carts_count',
+        )
+        # Ids and dates grow together, as they do in production.
+        ages = random_ages(self.rng, count)
+        for first in range(0, count, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, count - first)
+            dates = to_dates(self.now, ages[first:first + size])
+            chunk_authors = authors.draw(size).tolist()
+            words = ingredients.draw(size * 4).reshape(size, 4).tolist()
+            cooking_times = self.rng.integers(5, 180, size).tolist()
+            self.write(Recipe, fields, [
+                (
+                    f'{names[words[offset][0]]} #{start + first + offset + 1}',
+                    ' '.join(names[word] for word in words[offset]),
+                    'recipes/fixture.png', False, chunk_authors[offset],
+                    cooking_times[offset], dates[offset], 0, 0,
+                )
+                for offset in range(size)
+            ])
+        return new_ids(Recipe, start)
+
+    def create_recipe_items(self, recipe_ids, ingredients, tags,
+                            ingredients_per_recipe):
+        for first in range(0, len(recipe_ids), CHUNK_SIZE):
+            chunk = recipe_ids[first:first + CHUNK_SIZE]
+            sizes = self.rng.integers(
+                max(1, ingredients_per_recipe // 2),
+                ingredients_per_recipe * 3 // 2 + 1, len(chunk),
+            )
+            recipes, items = unique_pairs(
+                np.repeat(chunk, sizes), ingredients.draw(sizes.sum())
+            )
+            amounts = self.rng.integers(1, 500, len(recipes))
+            self.write(
+                IngredientsRecipe, ('recipe_id', 'ingredient_id', 'amount'),
+                list(zip(recipes.tolist(), items.tolist(), amounts.tolist())),
+            )
+            recipes, items = unique_pairs(
+                np.repeat(chunk, 2), tags.draw(len(chunk) * 2)
+            )
+            self.write(
+                TagsRecipe, ('recipe_id', 'tag_id'),
+                list(zip(recipes.tolist(), items.tolist())),
+            )
+            # Running processes pick the recipes up into their coverage
+            # indexes on the next generation bump.
+            record_recipe_changes(chunk.tolist())
+
+    def create_interactions(self, model, user_ids, targets, mean,
+                            field='recipe_id', dated=True):
+        for first in range(0, len(user_ids), CHUNK_SIZE):
+            chunk = user_ids[first:first + CHUNK_SIZE]
+            users, items = unique_pairs(*self.draw_pairs(chunk, targets, mean))
+            if model is Follow:
+                keep = users != items
+                users, items = users[keep], items[keep]
+            fields = ('user_id', field)
+            rows = zip(users.tolist(), items.tolist())
+            if dated:
+                fields += ('created',)
+                ages = self.rng.random(len(users)) * HISTORY_DAYS * 86400
+                rows = (
+                    (user, item, date) for (user, item), date in zip(
+                        rows, to_dates(self.now, ages)
+                    )
+                )
+            self.write(model, fields, list(rows))
+
+    def create_feed_entries(self, after):
+        """
+        Copy the latest FEED_BACKFILL recipes of every author followed
+        since the Follow id `after` into the follower's feed, the way
+        recipes.feed.follow_author does.
+        """
+        follows = Follow.objects.filter(
+            author__followers_count__lt=settings.FEED_FANOUT_MAX_FOLLOWERS
+        ).order_by('pk').values_list('pk', 'user_id', 'author_id')
+        while True:
+            chunk = list(follows.filter(pk__gt=after)[:FEED_CHUNK_SIZE])
+            if not chunk:
+                break
+            after = chunk[-1][0]
+            latest = Recipe.objects.latest_per_author(
+                {author_id for _, _, author_id in chunk},
+                settings.FEED_BACKFILL,
+            )
+            self.write(
+                FeedEntry, ('user_id', 'recipe_id', 'author_id', 'pub_date'),
+                [
+                    (user_id, recipe.pk, author_id, recipe.pub_date)
+                    for _, user_id, author_id in chunk
+                    for recipe in latest.get(author_id, ())
+                ],
+            )
+
+    def draw_pairs(self, users, targets, mean):
+        sizes = activity(self.rng, len(users), mean)
+        return np.repeat(users, sizes), targets.draw(sizes.sum())
+
+    def generate(self, users, recipes, follows, favorites, cart,
+                 ingredients_per_recipe, tags):
+        """Create the rows; returns {model name: rows written}."""
+        ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+        if not ingredient_ids:
+            raise ValueError('No ingredients, run load_ingredients first')
+        ingredients = Popularity(self.rng, ingredient_ids, self.exponent)
+        tags = Popularity(self.rng, self.ensure_tags(tags), self.exponent)
+        self.log(f'Creating {users} users')
+        user_ids = self.create_users(users)
+        authors = Popularity(self.rng, user_ids, self.exponent)
+        self.log(f'Creating {recipes} recipes')
+        recipe_ids = self.create_recipes(recipes, authors, ingredients)
+        self.log('Adding ingredients and tags')
+        self.create_recipe_items(
+            recipe_ids, ingredients, tags, ingredients_per_recipe
+        )
+        recipe_popularity = Popularity(self.rng, recipe_ids, self.exponent)
+        self.log('Adding follows, favorites and carts')
+        last_follow = Follow.objects.aggregate(last=Max('pk'))['last'] or 0
+        self.create_interactions(
+            Follow, user_ids, authors, follows, 'author_id', dated=False
+        )
+        self.create_interactions(
+            FavoriteRecipe, user_ids, recipe_popularity, favorites
+        )
+        self.create_interactions(ShoppingCart, user_ids, recipe_popularity, cart)
+        # Rows were written without signals, so the denormalized counters
+        # are recomputed before they decide which authors fan out.
+        recount()
+        self.log('Filling feeds')
+        self.create_feed_entries(last_follow)
+        return self.counts
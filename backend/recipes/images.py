@@ -0,0 +1,105 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image
+
+from .cache import bump_generation
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Longest side, in pixels, of each generated variant.
+IMAGE_VARIANTS = {
+    'thumbnail': 160,
+    'card': 480,
+    'full': 1280,
+}
+VARIANT_FORMAT = 'WEBP'
+VARIANT_EXTENSION = 'webp'
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS,
+            thread_name_prefix='image-variants',
+        )
+    return _executor
+
+
+def variant_name(name, variant):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'recipes/variants/{stem}_{variant}.{VARIANT_EXTENSION}'
+
+
+def variant_urls(recipe):
+    """Variant URLs once they exist, the original image until then."""
+    if not recipe.image:
+        return None
+    if not recipe.has_image_variants:
+        return {variant: recipe.image.url for variant in IMAGE_VARIANTS}
+    return {
+        variant: default_storage.url(variant_name(recipe.image.name, variant))
+        for variant in IMAGE_VARIANTS
+    }
+
+
+def render_variants(name, force=False):
+    targets = {
+        variant: variant_name(name, variant) for variant in IMAGE_VARIANTS
+    }
+    if not force and all(map(default_storage.exists, targets.values())):
+        # Files are content-addressed, so existing variants are current.
+        return
+    with default_storage.open(name) as file:
+        original = Image.open(file)
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA')
+    for variant, size in IMAGE_VARIANTS.items():
+        image = original.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(
+            buffer, VARIANT_FORMAT, quality=settings.IMAGE_VARIANT_QUALITY,
+            method=4,
+        )
+        target = targets[variant]
+        if default_storage.exists(target):
+            default_storage.delete(target)
+        default_storage.save(target, ContentFile(buffer.getvalue()))
+
+
+def generate_variants(recipe_id, name, force=False):
+    """Render all variants of an image and mark the recipe as ready."""
+    close_old_connections()
+    try:
+        render_variants(name, force)
+        # Only flag the recipe if its image has not been replaced meanwhile.
+        updated = Recipe.objects.filter(pk=recipe_id, image=name).update(
+            has_image_variants=True
+        )
+        if updated:
+            # update() sends no post_save, so cached pages are bumped here.
+            bump_generation('recipes')
+    except Exception:
+        logger.exception('Could not generate variants of %s', name)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(recipe):
+    """Render variants in the worker pool once the transaction commits."""
+    recipe_id, name = recipe.pk, recipe.image.name
+    transaction.on_commit(
+        lambda: get_executor().submit(generate_variants, recipe_id, name)
+    )
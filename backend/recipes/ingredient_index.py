@@ -0,0 +1,62 @@
+import hashlib
+import threading
+from bisect import bisect_left
+
+from .cache import get_generation
+from .models import Ingredient
+
+
+class IngredientPrefixIndex:
+    """
+    Case-folded, sorted copy of the ingredient catalogue.
+
+    Lookups bisect to the first name with the prefix and walk forward, so
+    a query touches only the matching rows. The index is rebuilt lazily
+    whenever the catalogue version changes.
+    """
+
+    def __init__(self):
+        self.state = (None, [], [])
+        self.lock = threading.Lock()
+
+    def build(self, version):
+        rows = sorted(
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit'),
+            key=lambda row: (row[1].casefold(), row[0]),
+        )
+        keys = [name.casefold() for _, name, _ in rows]
+        items = [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for pk, name, unit in rows
+        ]
+        # Swapped in as one tuple so readers never see a half-built index.
+        self.state = (version, keys, items)
+
+    def current(self):
+        version = get_generation('ingredients')
+        if self.state[0] != version:
+            with self.lock:
+                if self.state[0] != version:
+                    self.build(version)
+        return self.state
+
+    def search(self, prefix):
+        """Return (catalogue version, ingredients starting with prefix)."""
+        version, keys, items = self.current()
+        prefix = prefix.casefold()
+        if not prefix:
+            return version, items
+        start = bisect_left(keys, prefix)
+        end = start
+        while end < len(keys) and keys[end].startswith(prefix):
+            end += 1
+        return version, items[start:end]
+
+    def etag(self, version, prefix):
+        digest = hashlib.md5(
+            f'{version}:{prefix.casefold()}'.encode()
+        ).hexdigest()
+        return f'"{digest}"'
+
+
+ingredient_index = IngredientPrefixIndex()
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import compute_similar_recipes
+
+
+class Command(BaseCommand):
+    help = (
+        'Precompute similar recipes from favorites and shopping carts. '
+        'Only recipes with new or removed interactions since the last run, '
+        'and their neighbours, are refreshed unless --full is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Recompute every recipe, dropping stale neighbours.'
+        )
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument(
+            '--max-products', type=int, default=2000000,
+            help='Bound on the co-occurrence products held in memory.'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        refreshed = compute_similar_recipes(
+            options['top'], options['max_products'], options['full'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(
+            f'Refreshed {refreshed} recipes in '
+            f'{time.monotonic() - started:.2f}s'
+        )
@@ -0,0 +1,77 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.cache import bump_generation
+from recipes.generator import FixtureGenerator, get_writer
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate users, recipes, ingredients, tags, follows, favorites and '
+        'shopping carts with Zipf-like popularity for scale testing. Rows '
+        'are written with COPY on PostgreSQL and bulk_create elsewhere. '
+        'Run rebuild_search_index and compute_similar_recipes --full '
+        'afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--follows', type=float, default=10,
+            help='Mean number of authors a user follows.'
+        )
+        parser.add_argument(
+            '--favorites', type=float, default=20,
+            help='Mean number of favorites per user.'
+        )
+        parser.add_argument(
+            '--cart', type=float, default=5,
+            help='Mean number of recipes in a shopping cart.'
+        )
+        parser.add_argument(
+            '--ingredients', type=int, default=8,
+            help='Mean number of ingredients per recipe.'
+        )
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='Zipf exponent; larger values concentrate popularity.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Use bulk_create on PostgreSQL as well.'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['recipes'] < 1:
+            raise CommandError('--users and --recipes must be positive')
+        if not Ingredient.objects.exists():
+            call_command('load_ingredients', stdout=self.stdout)
+        started = time.monotonic()
+        generator = FixtureGenerator(
+            get_writer(options['batch_size'], not options['no_copy']),
+            seed=options['seed'], exponent=options['exponent'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        counts = generator.generate(
+            users=options['users'], recipes=options['recipes'],
+            follows=options['follows'], favorites=options['favorites'],
+            cart=options['cart'],
+            ingredients_per_recipe=options['ingredients'],
+            tags=options['tags'],
+        )
+        # Rows were written without signals, so cached pages are
+        # invalidated here.
+        bump_generation('recipes', 'tags', 'users')
+        for name, rows in counts.items():
+            self.stdout.write(f'{name}: {rows} rows')
+        self.stdout.write(
+            f'Generated {sum(counts.values())} rows in '
+            f'{time.monotonic() - started:.2f}s'
+        )
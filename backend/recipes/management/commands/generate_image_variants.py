@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_variants, get_executor
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Render resized WebP variants for recipe images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Re-render variants that already exist.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(has_image_variants=False)
+        executor = get_executor()
+        jobs = [
+            executor.submit(generate_variants, pk, name, options['all'])
+            for pk, name in recipes.values_list('pk', 'image').iterator()
+        ]
+        for job in jobs:
+            job.result()
+        self.stdout.write(f'Rendered variants for {len(jobs)} recipes')
@@ -0,0 +1,217 @@
+import csv
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.cache import bump_generation
+from recipes.models import Ingredient, IngredientsRecipe
+from recipes.search import schedule_search_refresh
+
+DEFAULT_PATH = os.path.join(settings.BASE_DIR, 'data', 'ingredients.json')
+FORMATS = ('json', 'csv', 'ndjson')
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(file):
+    """Yield the objects of a top-level JSON array one at a time."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started and buffer:
+            if buffer[0] != '[':
+                raise CommandError('Expected a JSON array of ingredients')
+            buffer = buffer[1:]
+            started = True
+            continue
+        if started:
+            buffer = buffer.lstrip(', \t\r\n')
+            if buffer.startswith(']'):
+                return
+            if buffer:
+                try:
+                    item, end = decoder.raw_decode(buffer)
+                except ValueError:
+                    if eof:
+                        raise CommandError('Malformed JSON ingredients file')
+                else:
+                    yield item
+                    buffer = buffer[end:]
+                    continue
+        if eof:
+            if started:
+                raise CommandError('Unterminated JSON array')
+            return
+        chunk = file.read(CHUNK_SIZE)
+        eof = not chunk
+        buffer += chunk
+
+
+def iter_ndjson(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_csv(file):
+    yield from csv.DictReader(file)
+
+
+READERS = {
+    'json': iter_json_array,
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+}
+
+
+def normalize(name, measurement_unit):
+    return name.strip().casefold(), measurement_unit.strip().casefold()
+
+
+class Command(BaseCommand):
+    help = (
+        'Upsert the ingredient catalogue from a JSON, CSV or NDJSON file, '
+        'or compare it with the database using --verify.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+        parser.add_argument(
+            '--format', choices=FORMATS, dest='file_format',
+            help='File format; guessed from the extension by default.'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only report differences between the file and the database.'
+        )
+
+    def get_format(self, path, file_format):
+        if file_format:
+            return file_format
+        extension = os.path.splitext(path)[1].lstrip('.').lower()
+        if extension == 'jsonl':
+            return 'ndjson'
+        if extension not in FORMATS:
+            raise CommandError(
+                f'Cannot guess the format of {path}, use --format'
+            )
+        return extension
+
+    def read_entries(self, path, file_format):
+        """Yield (name, measurement_unit) pairs from the file."""
+        with open(path, encoding='utf-8', newline='') as file:
+            for number, entry in enumerate(READERS[file_format](file), 1):
+                try:
+                    name = entry['name'].strip()
+                    measurement_unit = entry['measurement_unit'].strip()
+                except (KeyError, AttributeError, TypeError):
+                    raise CommandError(f'Invalid ingredient #{number}')
+                if not name or not measurement_unit:
+                    raise CommandError(f'Invalid ingredient #{number}')
+                yield name, measurement_unit
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+        file_format = self.get_format(path, options['file_format'])
+        entries = self.read_entries(path, file_format)
+        started = time.monotonic()
+        if options['verify']:
+            self.verify(entries)
+        else:
+            self.load(entries, options['batch_size'])
+        self.stdout.write(f'Done in {time.monotonic() - started:.2f}s')
+
+    @transaction.atomic
+    def load(self, entries, batch_size):
+        existing = {}
+        for pk, name, unit in Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit'
+        ):
+            existing.setdefault(normalize(name, unit), (pk, name, unit))
+        seen = set()
+        to_create, to_update, renamed = [], [], []
+        inserted = updated = skipped = 0
+        for name, unit in entries:
+            key = normalize(name, unit)
+            if key in seen:
+                skipped += 1
+                continue
+            seen.add(key)
+            if key not in existing:
+                to_create.append(
+                    Ingredient(name=name, measurement_unit=unit)
+                )
+            elif existing[key][1:] != (name, unit):
+                # Same ingredient spelled differently: the file wins.
+                to_update.append(Ingredient(
+                    id=existing[key][0], name=name, measurement_unit=unit
+                ))
+                renamed.append(existing[key][0])
+            else:
+                skipped += 1
+            if len(to_create) >= batch_size:
+                Ingredient.objects.bulk_create(to_create)
+                inserted += len(to_create)
+                to_create = []
+            if len(to_update) >= batch_size:
+                Ingredient.objects.bulk_update(
+                    to_update, ['name', 'measurement_unit']
+                )
+                updated += len(to_update)
+                to_update = []
+        Ingredient.objects.bulk_create(to_create)
+        Ingredient.objects.bulk_update(
+            to_update, ['name', 'measurement_unit'], batch_size=batch_size
+        )
+        inserted += len(to_create)
+        updated += len(to_update)
+        if inserted or updated:
+            # bulk_create/bulk_update do not send post_save.
+            transaction.on_commit(lambda: bump_generation('ingredients'))
+        if renamed:
+            # Recipes embed ingredient names; refreshing their search
+            # documents also bumps the cached recipe pages.
+            schedule_search_refresh(self.recipes_using(renamed, batch_size))
+        self.stdout.write(
+            f'Inserted: {inserted}, updated: {updated}, skipped: {skipped}'
+        )
+
+    def recipes_using(self, ingredient_ids, batch_size):
+        recipe_ids = set()
+        for start in range(0, len(ingredient_ids), batch_size):
+            recipe_ids.update(IngredientsRecipe.objects.filter(
+                ingredient_id__in=ingredient_ids[start:start + batch_size]
+            ).values_list('recipe_id', flat=True))
+        return recipe_ids
+
+    def verify(self, entries):
+        in_file = {normalize(name, unit) for name, unit in entries}
+        in_db = {}
+        for name, unit in Ingredient.objects.values_list(
+            'name', 'measurement_unit'
+        ):
+            key = normalize(name, unit)
+            in_db[key] = in_db.get(key, 0) + 1
+        missing = sorted(in_file - in_db.keys())
+        extra = sorted(in_db.keys() - in_file)
+        duplicated = sorted(key for key, count in in_db.items() if count > 1)
+        for title, keys in (
+            ('Missing from the database', missing),
+            ('Not in the file', extra),
+            ('Duplicated in the database', duplicated),
+        ):
+            self.stdout.write(f'{title}: {len(keys)}')
+            for name, unit in keys:
+                self.stdout.write(f'  {name} ({unit})')
+        if missing or extra or duplicated:
+            raise CommandError('The database differs from the file')
+        self.stdout.write(self.style.SUCCESS('The database matches the file'))
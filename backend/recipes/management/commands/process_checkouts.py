@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.checkout import process_batch
+
+
+class Command(BaseCommand):
+    help = 'Send queued checkout jobs to the external grocery service.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument(
+            '--sleep', type=float, default=1.0,
+            help='Seconds to wait when the queue is empty.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Drain the queue and exit instead of polling forever.'
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            count = process_batch(options['batch_size'])
+            processed += count
+            if count:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+        self.stdout.write(f'Processed {processed} checkout jobs')
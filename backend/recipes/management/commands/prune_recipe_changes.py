@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.coverage_index import prune_recipe_changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete recipe change log entries that no coverage index replays '
+        'any more. Run it periodically, e.g. daily from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention', type=int,
+            default=settings.COVERAGE_INDEX_CHANGE_RETENTION,
+            help='Keep entries younger than this many seconds.'
+        )
+
+    def handle(self, *args, **options):
+        if options['retention'] < settings.COVERAGE_INDEX_MAX_AGE:
+            raise CommandError(
+                '--retention must not be shorter than '
+                'COVERAGE_INDEX_MAX_AGE, or indexes may miss changes'
+            )
+        deleted = prune_recipe_changes(options['retention'])
+        self.stdout.write(f'Deleted {deleted} change log entries')
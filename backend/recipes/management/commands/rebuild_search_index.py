@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe
+from recipes.search import refresh_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search documents of every recipe.'
+
+    def handle(self, *args, **options):
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        with transaction.atomic():
+            refresh_search_index(recipe_ids)
+        self.stdout.write(f'Indexed {len(recipe_ids)} recipes')
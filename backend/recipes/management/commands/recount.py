@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized favorite, cart, recipe and follower counts.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drifted = recount()
+        for counter, rows in drifted.items():
+            self.stdout.write(f'{counter}: {rows} rows fixed')
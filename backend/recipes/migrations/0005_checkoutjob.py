@@ -0,0 +1,46 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0004_auto_20241008_2152'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckoutJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('idempotency_key', models.CharField(blank=True, max_length=255)),
+                ('items', models.TextField(help_text='JSON encoded shopping list')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('order_uuid', models.CharField(blank=True, max_length=64)),
+                ('error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkout_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Checkout job',
+                'verbose_name_plural': 'Checkout jobs',
+                'ordering': ('created',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='checkoutjob',
+            index=models.Index(fields=['status', 'created'], name='checkout_status_created'),
+        ),
+        migrations.AddConstraint(
+            model_name='checkoutjob',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='unique_checkout_idempotency_key'),
+        ),
+    ]
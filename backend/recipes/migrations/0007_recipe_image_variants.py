@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='has_image_variants',
+            field=models.BooleanField(default=False, editable=False, verbose_name='resized image variants are ready'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:21
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+INGREDIENT_NAMES = """
+    COALESCE((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM recipes_ingredientsrecipe AS item
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = item.ingredient_id
+        WHERE item.recipe_id = recipes_recipe.id
+    ), '')
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        # Existing rows are indexed with settings.SEARCH_CONFIG as it is
+        # when the migration runs; after changing it, run
+        # `manage.py rebuild_search_index` to rebuild the vectors.
+        schema_editor.execute(
+            'CREATE INDEX recipes_recipe_search_vector_gin '
+            'ON recipes_recipe USING gin (search_vector)'
+        )
+        schema_editor.execute(
+            'UPDATE recipes_recipe SET search_vector = '
+            "setweight(to_tsvector(%(config)s, name), 'A') || "
+            f"setweight(to_tsvector(%(config)s, {INGREDIENT_NAMES}), 'B') || "
+            "setweight(to_tsvector(%(config)s, text), 'C')",
+            {'config': settings.SEARCH_CONFIG},
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5('
+            "name, ingredients, text, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            'INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text) '
+            'SELECT id, name, '
+            + INGREDIENT_NAMES.replace("string_agg", "group_concat")
+            + ', text FROM recipes_recipe'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX recipes_recipe_search_vector_gin')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE recipes_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
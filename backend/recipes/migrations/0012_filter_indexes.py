@@ -0,0 +1,59 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def remove_duplicate_tags(apps, schema_editor):
+    TagsRecipe = apps.get_model('recipes', 'TagsRecipe')
+    keep = TagsRecipe.objects.values('tag', 'recipe').annotate(
+        first=models.Min('id')
+    ).values('first')
+    TagsRecipe.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_feedentry'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='favoriterecipe',
+            name='unique_favorite',
+        ),
+        migrations.RemoveConstraint(
+            model_name='shoppingcart',
+            name='unique_recipe_cart',
+        ),
+        migrations.AlterField(
+            model_name='favoriterecipe',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='favorite_recipes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='tagsrecipe',
+            name='tag',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='recipes.Tag'),
+        ),
+        migrations.AddConstraint(
+            model_name='favoriterecipe',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_favorite'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_recipe_cart'),
+        ),
+        migrations.RunPython(remove_duplicate_tags, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='tagsrecipe',
+            constraint=models.UniqueConstraint(fields=('tag', 'recipe'), name='unique_recipe_tag'),
+        ),
+    ]
@@ -1,5 +1,10 @@
+import uuid
+
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import BooleanField, Exists, F, OuterRef, Value, Window
+from django.db.models.functions import RowNumber
 
 
 from users.models import CustomUser
@@ -50,6 +55,67 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        """Annotate is_favorited / is_in_shopping_cart for the given user."""
+        if user is None or user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                recipe=OuterRef('pk'), user=user
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                recipe=OuterRef('pk'), user=user
+            )),
+        )
+
+    def with_related(self):
+        """Load author, tags and ingredients in a fixed number of queries."""
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipe_ingredients',
+                queryset=IngredientsRecipe.objects.select_related(
+                    'ingredient'
+                ),
+            ),
+        )
+
+    def latest_per_author(self, author_ids, limit=None):
+        """
+        Return {author_id: [recipe, ...]}, newest first, with at most
+        `limit` recipes per author, in a single query.
+        """
+        queryset = self.filter(author_id__in=author_ids).order_by().only(
+            'id', 'name', 'image', 'has_image_variants', 'cooking_time',
+            'author_id', 'pub_date'
+        )
+        if limit is None:
+            recipes = queryset.order_by('author_id', '-pub_date', '-id')
+        else:
+            # Django cannot filter on a window function, so the ranked
+            # query is wrapped in an outer SELECT.
+            ranked = queryset.annotate(row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=[F('pub_date').desc(), F('id').desc()],
+            ))
+            sql, params = ranked.query.sql_with_params()
+            recipes = self.model.objects.raw(
+                f'SELECT * FROM ({sql}) ranked WHERE row_number <= %s '
+                f'ORDER BY author_id, pub_date DESC, id DESC',
+                (*params, limit),
+            )
+        grouped = {}
+        for recipe in recipes:
+            grouped.setdefault(recipe.author_id, []).append(recipe)
+        return grouped
+
+
 class Recipe(models.Model):
     name = models.CharField(unique=True, max_length=200, verbose_name='recipe title')
     image = models.ImageField(
@@ -57,6 +123,10 @@ class Recipe(models.Model):
         verbose_name='recipe image',
         help_text='Recipe image',
     )
+    has_image_variants = models.BooleanField(
+        default=False, editable=False,
+        verbose_name='resized image variants are ready',
+    )
     author = models.ForeignKey(
         CustomUser, on_delete=models.CASCADE, related_name='recipes',
         verbose_name='recipe author', help_text='Recipe author',
@@ -84,6 +154,19 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         'Created at', auto_now_add=True, db_index=True
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0, db_index=True, editable=False,
+        verbose_name='times added to favorites',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0, db_index=True, editable=False,
+        verbose_name='times added to shopping carts',
+    )
+    # Maintained by recipes.search on PostgreSQL; its GIN index is created
+    # in the 0008 migration because SQLite cannot build one.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ("-pub_date",)
@@ -119,14 +202,25 @@ class IngredientsRecipe(models.Model):
 
 
 class TagsRecipe(models.Model):
-    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    # Covered by the (tag, recipe) constraint below.
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, db_index=False)
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'recipe'],
+                name='unique_recipe_tag'
+            )
+        ]
+
 
 class FavoriteRecipe(models.Model):
+    # Covered by the (user, recipe) constraint below.
     user = models.ForeignKey(
         CustomUser,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='favorite_recipes'
     )
     recipe = models.ForeignKey(
@@ -135,20 +229,23 @@ class FavoriteRecipe(models.Model):
         blank=False, null=False,
         related_name='favorite_recipes'
     )
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         constraints = [
             models.UniqueConstraint(
-                fields=['recipe', 'user'],
+                fields=['user', 'recipe'],
                 name='unique_favorite'
             )
         ]
 
 
 class ShoppingCart(models.Model):
+    # Covered by the (user, recipe) constraint below.
     user = models.ForeignKey(
         CustomUser,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='shopping_cart'
     )
     recipe = models.ForeignKey(
@@ -156,12 +253,152 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         related_name='shopping_cart'
     )
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         verbose_name = 'Shopping cart'
         constraints = [
             models.UniqueConstraint(
-                fields=['recipe', 'user'],
+                fields=['user', 'recipe'],
                 name='unique_recipe_cart'
             )
         ]
+
+
+class CheckoutJob(models.Model):
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (PROCESSING, 'Processing'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4,
+                          editable=False)
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='checkout_jobs'
+    )
+    idempotency_key = models.CharField(max_length=255, blank=True)
+    items = models.TextField(help_text='JSON encoded shopping list')
+    status = models.CharField(
+        choices=STATUSES, max_length=10, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    order_uuid = models.CharField(max_length=64, blank=True)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('created',)
+        verbose_name = 'Checkout job'
+        verbose_name_plural = 'Checkout jobs'
+        indexes = [
+            models.Index(fields=['status', 'created'],
+                         name='checkout_status_created'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'idempotency_key'],
+                name='unique_checkout_idempotency_key'
+            )
+        ]
+
+
+class RecipeChange(models.Model):
+    """
+    Append-only log of written or deleted recipes.
+
+    In-memory indexes replay it to catch up with writes made by other
+    processes; `manage.py prune_recipe_changes` deletes old entries.
+    """
+    recipe_id = models.PositiveIntegerField()
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ('id',)
+
+
+class RemovedInteraction(models.Model):
+    """
+    Log of deleted favorites and shopping cart entries.
+
+    Incremental compute_similar_recipes runs only see the rows that still
+    exist, so they replay this log to refresh the recipes a removal
+    touched; each run deletes the entries the previous run applied.
+    """
+    user_id = models.PositiveIntegerField()
+    recipe_id = models.PositiveIntegerField()
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ('id',)
+
+
+class SimilarRecipe(models.Model):
+    """
+    Precomputed item-to-item neighbours of a recipe.
+
+    Filled by the compute_similar_recipes command from favorites and
+    shopping carts; `computed_at` is the start of the run that wrote the
+    row and doubles as the watermark for incremental runs.
+    """
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name='similar_recipes'
+    )
+    similar = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name='+'
+    )
+    score = models.FloatField()
+    computed_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ('recipe', '-score')
+        indexes = [
+            models.Index(fields=['recipe', '-score'],
+                         name='similar_recipe_score'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_similar_recipe'
+            )
+        ]
+
+
+class FeedEntry(models.Model):
+    """
+    A recipe in the timeline of one of its author's followers.
+
+    Written in bulk when the recipe is published; authors with more than
+    FEED_FANOUT_MAX_FOLLOWERS followers are merged in on read instead.
+    """
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name='feed_entries'
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name='+'
+    )
+    author = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name='+',
+        db_index=False,
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-recipe'],
+                         name='feed_user_pub_date'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry'
+            )
+        ]
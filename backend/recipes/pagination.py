@@ -0,0 +1,79 @@
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class RecipeCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (pub_date, id) for infinite scroll clients.
+
+    Pages are fetched with a WHERE on the pub_date index instead of an
+    OFFSET, and no COUNT(*) is run.
+    """
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        # Cursors encode a position in (pub_date, id), so ?ordering is
+        # ignored: counters are neither unique nor stable between pages.
+        return self.ordering
+
+
+class FeedPagination:
+    """
+    Keyset cursor for the feed, which is merged from two sources and so
+    cannot be paginated as one queryset.
+
+    The cursor encodes the (pub_date, recipe id) of the last item shown.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 10
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            pub_date, recipe_id = b64decode(
+                encoded.encode(), validate=True
+            ).decode().rsplit('|', 1)
+            position = (parse_datetime(pub_date), int(recipe_id))
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if position[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, request, position):
+        pub_date, recipe_id = position
+        encoded = b64encode(
+            f'{pub_date.isoformat()}|{recipe_id}'.encode()
+        ).decode()
+        return replace_query_param(
+            request.build_absolute_uri(), self.cursor_query_param, encoded
+        )
+
+    def get_paginated_response(self, request, data, next_position):
+        return Response({
+            'next': (
+                self.encode_cursor(request, next_position)
+                if next_position else None
+            ),
+            'results': data,
+        })
@@ -0,0 +1,32 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+def sse_event(data, event=None):
+    """Encode one Server-Sent Event carrying `data` as JSON."""
+    message = f'data: {json.dumps(data, ensure_ascii=False)}\n\n'
+    if event:
+        message = f'event: {event}\n{message}'
+    return message.encode()
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets views negotiate `Accept: text/event-stream`.
+
+    Streaming views return their own StreamingHttpResponse; this renderer
+    only encodes ordinary responses, such as validation errors, as a
+    single event so that EventSource-style clients can read them.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        event = (
+            'error' if response is not None and response.status_code >= 400
+            else None
+        )
+        return sse_event(data, event)
@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models import F, FloatField, OuterRef, Subquery, TextField
+from django.db.models.expressions import RawSQL
+
+from .cache import bump_generation
+from .models import IngredientsRecipe, Recipe
+
+FTS_TABLE = 'recipes_recipe_fts'
+# bm25() weights of the name, ingredients and text FTS5 columns.
+FTS_WEIGHTS = (10.0, 4.0, 1.0)
+REFRESH_BATCH_SIZE = 500
+
+
+class PostgresSearch:
+    """
+    Searches the `search_vector` tsvector column through its GIN index.
+
+    The vector weighs the name (A) above the ingredient names (B) and the
+    text (C), so ts_rank puts title matches first.
+    """
+
+    def refresh(self, recipe_ids):
+        from django.contrib.postgres.aggregates import StringAgg
+
+        config = settings.SEARCH_CONFIG
+        ingredient_names = Subquery(
+            IngredientsRecipe.objects
+            .filter(recipe=OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(names=StringAgg('ingredient__name', ' '))
+            .values('names'),
+            output_field=TextField(),
+        )
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            search_vector=(
+                SearchVector('name', config=config, weight='A')
+                + SearchVector(ingredient_names, config=config, weight='B')
+                + SearchVector('text', config=config, weight='C')
+            )
+        )
+
+    def search(self, queryset, terms):
+        query = SearchQuery(terms, config=settings.SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        )
+
+
+class SQLiteSearch:
+    """
+    Searches the `recipes_recipe_fts` FTS5 table, keyed by recipe id.
+
+    SQLite has no tsvector, so local and test databases keep a separate
+    full-text table, created by the 0008 migration, and rank with bm25().
+    """
+
+    def refresh(self, recipe_ids):
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                recipe_ids,
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+                f'SELECT recipe.id, recipe.name, COALESCE(('
+                f'  SELECT group_concat(ingredient.name, \' \') '
+                f'  FROM recipes_ingredientsrecipe AS item '
+                f'  JOIN recipes_ingredient AS ingredient '
+                f'    ON ingredient.id = item.ingredient_id '
+                f'  WHERE item.recipe_id = recipe.id'
+                f'), \'\'), recipe.text '
+                f'FROM recipes_recipe AS recipe '
+                f'WHERE recipe.id IN ({placeholders})',
+                recipe_ids,
+            )
+
+    def match_expression(self, terms):
+        # Quote every word so user input cannot use FTS5 query syntax.
+        return ' '.join(
+            '"{}"'.format(word.replace('"', '""')) for word in terms.split()
+        )
+
+    def search(self, queryset, terms):
+        match = self.match_expression(terms)
+        weights = ', '.join(map(str, FTS_WEIGHTS))
+        recipe_table = Recipe._meta.db_table
+        # filter(pk__in=RawSQL(...)) would wrap the subquery in a second
+        # pair of parentheses, turning it into a scalar subquery.
+        return queryset.extra(
+            where=[
+                f'{recipe_table}.id IN (SELECT rowid FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s)'
+            ],
+            params=[match],
+        ).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = {recipe_table}.id',
+            [match],
+            output_field=FloatField(),
+        ))
+
+
+BACKENDS = {
+    'postgresql': PostgresSearch,
+    'sqlite': SQLiteSearch,
+}
+
+
+def get_search_backend():
+    try:
+        return BACKENDS[connection.vendor]()
+    except KeyError:
+        raise ImproperlyConfigured(
+            f'Recipe search does not support {connection.vendor}'
+        )
+
+
+def search_recipes(queryset, terms):
+    """Filter to recipes matching `terms`, annotated with `search_rank`."""
+    return get_search_backend().search(queryset, terms)
+
+
+def refresh_search_index(recipe_ids):
+    """Rebuild the search documents of the given recipes."""
+    recipe_ids = list(recipe_ids)
+    backend = get_search_backend()
+    for start in range(0, len(recipe_ids), REFRESH_BATCH_SIZE):
+        backend.refresh(recipe_ids[start:start + REFRESH_BATCH_SIZE])
+    # The documents are written without post_save, so cached search
+    # pages are bumped here.
+    bump_generation('recipes')
+
+
+def schedule_search_refresh(recipe_ids):
+    """Refresh once the transaction commits and ingredients are written."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: refresh_search_index(recipe_ids))
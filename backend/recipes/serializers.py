@@ -1,13 +1,14 @@
-import traceback
-
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from users.models import CustomUser
 
-from .models import (FavoriteRecipe, Ingredient, IngredientsRecipe, Recipe,
-                     ShoppingCart, Tag, TagsRecipe)
+from .feed import schedule_fan_out
+from .fields import HashedBase64ImageField
+from .images import schedule_variants, variant_urls
+from .models import (CheckoutJob, FavoriteRecipe, Ingredient,
+                     IngredientsRecipe, Recipe, ShoppingCart, SimilarRecipe,
+                     Tag, TagsRecipe)
 
 
 class AuthorSerializer(serializers.ModelSerializer):
@@ -25,10 +26,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class IngredientsRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source='ingredient.id'
-    )
+    id = serializers.IntegerField(source='ingredient.id')
     name = serializers.CharField(
         read_only=True,
         source='ingredient.name'
@@ -64,108 +62,168 @@ class RecipeSerializer(serializers.ModelSerializer):
     ingredients = IngredientsRecipeSerializer(
         many=True, source='recipe_ingredients'
     )
-    image = Base64ImageField(
+    image = HashedBase64ImageField(
         max_length=None, use_url=True,
     )
     text = serializers.CharField()
     cooking_time = serializers.IntegerField(max_value=32767, min_value=1)
+    image_variants = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date',)
+        fields = (
+            'id', 'tags', 'author', 'ingredients', 'is_favorited',
+            'is_in_shopping_cart', 'name', 'image', 'image_variants', 'text',
+            'cooking_time',
+        )
 
-    def get_status_func(self, data):
+    def get_image_variants(self, data):
+        return variant_urls(data)
+
+    def get_user_flag(self, data, flag, model):
+        if hasattr(data, flag):
+            return bool(getattr(data, flag))
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
-        try:
-            user = self.context.get('request').user
-        except:
-            user = self.context.get('user')
-        callname_function = format(traceback.extract_stack()[-2][2])
-        if callname_function == 'get_is_favorited':
-            init_queryset = FavoriteRecipe.objects.filter(recipe=data.id, user=user)
-        elif callname_function == 'get_is_in_shopping_cart':
-            init_queryset = ShoppingCart.objects.filter(recipe=data, user=user)
-        if init_queryset.exists():
-            return True
-        return False
+        return model.objects.filter(recipe=data, user=request.user).exists()
 
     def get_is_favorited(self, data):
-        return self.get_status_func(data)
+        return self.get_user_flag(data, 'is_favorited', FavoriteRecipe)
 
     def get_is_in_shopping_cart(self, data):
-        return self.get_status_func(data)
+        return self.get_user_flag(
+            data, 'is_in_shopping_cart', ShoppingCart
+        )
+
+    def validate_tag_ids(self):
+        tag_ids = self.initial_data.get('tags')
+        if not isinstance(tag_ids, list):
+            raise serializers.ValidationError(
+                {'tags': 'Expected a list of tag ids'}
+            )
+        try:
+            tag_ids = [int(tag_id) for tag_id in tag_ids]
+        except (TypeError, ValueError):
+            raise serializers.ValidationError(
+                {'tags': 'Expected a list of tag ids'}
+            )
+        tags = Tag.objects.in_bulk(tag_ids)
+        missing = set(tag_ids) - tags.keys()
+        if missing:
+            raise serializers.ValidationError(
+                {'tags': f'Unknown tags: {sorted(missing)}'}
+            )
+        return [tags[tag_id] for tag_id in dict.fromkeys(tag_ids)]
 
     def validate(self, data):
-        context = self.context['request']
-        ingredients_set = context.data['ingredients']
-        uniq = []
-        for ingredient in ingredients_set:
-            ingredient_model = Ingredient.objects.get(id=ingredient['id'])
-            if ingredient_model in uniq:
+        if 'recipe_ingredients' in data:
+            ingredient_ids = [
+                item['ingredient']['id'] for item in data['recipe_ingredients']
+            ]
+            ingredients = Ingredient.objects.in_bulk(ingredient_ids)
+            missing = set(ingredient_ids) - ingredients.keys()
+            if missing:
                 raise serializers.ValidationError(
-                    f'Вы уже добавили {ingredient_model} в рецепт')
-            else:
-                uniq.append(ingredient_model)
+                    {'ingredients': f'Unknown ingredients: {sorted(missing)}'}
+                )
+            uniq = set()
+            for item in data['recipe_ingredients']:
+                ingredient_model = ingredients[item['ingredient']['id']]
+                if ingredient_model.id in uniq:
+                    raise serializers.ValidationError(
+                        f'Вы уже добавили {ingredient_model} в рецепт')
+                uniq.add(ingredient_model.id)
+                item['ingredient'] = ingredient_model
+        elif not self.partial:
+            raise serializers.ValidationError(
+                {'ingredients': 'This field is required.'}
+            )
+        if 'tags' in self.initial_data or not self.partial:
+            data['tags'] = self.validate_tag_ids()
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
-        context = self.context['request']
         ingredients = validated_data.pop('recipe_ingredients')
+        tags = validated_data.pop('tags')
         try:
-            recipe = Recipe.objects.create(
-                **validated_data,
-                author=self.context.get('request').user
-            )
-        except IntegrityError as err:
-            pass
-        tags_set = context.data['tags']
-        for tag in tags_set:
-            TagsRecipe.objects.create(
-                recipe=recipe,
-                tag=Tag.objects.get(id=tag)
+            with transaction.atomic():
+                recipe = Recipe.objects.create(
+                    **validated_data,
+                    author=self.context.get('request').user
+                )
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {'name': 'A recipe with this name already exists'}
             )
-        ingredients_set = context.data['ingredients']
-        for ingredient in ingredients_set:
-            ingredient_model = Ingredient.objects.get(id=ingredient['id'])
-            IngredientsRecipe.objects.create(
+        schedule_variants(recipe)
+        schedule_fan_out(recipe)
+        TagsRecipe.objects.bulk_create(
+            TagsRecipe(recipe=recipe, tag=tag) for tag in tags
+        )
+        IngredientsRecipe.objects.bulk_create(
+            IngredientsRecipe(
                 recipe=recipe,
-                ingredient=ingredient_model,
-                amount=ingredient['amount'],
+                ingredient=item['ingredient'],
+                amount=item['amount'],
             )
+            for item in ingredients
+        )
         return recipe
 
-    def update(self, instance, validated_data):
-        context = self.context['request']
-        ingredients = validated_data.pop('recipe_ingredients')
-        tags_set = context.data['tags']
-        recipe = instance
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get(
-            'cooking_time', instance.cooking_time
+    def update_ingredients(self, recipe, ingredients):
+        """Write only the ingredient rows that actually changed."""
+        amounts = {item['ingredient'].id: item['amount'] for item in ingredients}
+        existing = {
+            row.ingredient_id: row
+            for row in IngredientsRecipe.objects.filter(recipe=recipe)
+        }
+        removed = existing.keys() - amounts.keys()
+        if removed:
+            IngredientsRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        IngredientsRecipe.objects.bulk_create(
+            IngredientsRecipe(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
         )
-        instance.image = validated_data.get('image', instance.image)
-        instance.save()
-        instance.tags.set(tags_set)
-        IngredientsRecipe.objects.filter(recipe=instance).delete()
-        ingredients_req = context.data['ingredients']
-        uniq = []
-        for ingredient in ingredients_req:
-            ingredient_model = Ingredient.objects.get(id=ingredient['id'])
-            if ingredient_model in uniq:
-                raise serializers.ValidationError(
-                    f'Вы уже добавили {ingredient_model} в рецепт')
-            else:
-                uniq.append(ingredient_model)
-                IngredientsRecipe.objects.create(
-                    recipe=recipe,
-                    ingredient=ingredient_model,
-                    amount=ingredient['amount'],
-                )
+        changed = []
+        for ingredient_id, row in existing.items():
+            if ingredient_id in amounts and row.amount != amounts[ingredient_id]:
+                row.amount = amounts[ingredient_id]
+                changed.append(row)
+        IngredientsRecipe.objects.bulk_update(changed, ['amount'])
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        ingredients = validated_data.pop('recipe_ingredients', None)
+        tags = validated_data.pop('tags', None)
+        if validated_data.get('image') == instance.image.name:
+            # The same picture was sent again; keep the stored file.
+            validated_data.pop('image')
+        if 'image' in validated_data:
+            instance.has_image_variants = False
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        try:
+            with transaction.atomic():
+                instance.save()
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {'name': 'A recipe with this name already exists'}
+            )
+        if 'image' in validated_data:
+            schedule_variants(instance)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
         return instance
 
     def to_representation(self, instance):
@@ -175,6 +233,39 @@ class RecipeSerializer(serializers.ModelSerializer):
         return response
 
 
+class ShortRecipeSerializer(serializers.ModelSerializer):
+    image = serializers.CharField(read_only=True, source='image.url')
+    image_variants = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
+
+    def get_image_variants(self, data):
+        return variant_urls(data)
+
+
+class CookableRecipeSerializer(ShortRecipeSerializer):
+    covered = serializers.IntegerField(read_only=True)
+    missing = serializers.IntegerField(read_only=True)
+    missing_ingredients = serializers.ListField(
+        child=serializers.IntegerField(), read_only=True
+    )
+
+    class Meta(ShortRecipeSerializer.Meta):
+        fields = ShortRecipeSerializer.Meta.fields + (
+            'covered', 'missing', 'missing_ingredients'
+        )
+
+
+class SimilarRecipeSerializer(serializers.ModelSerializer):
+    recipe = ShortRecipeSerializer(source='similar', read_only=True)
+
+    class Meta:
+        model = SimilarRecipe
+        fields = ('recipe', 'score')
+
+
 class FavoritedSerializer(serializers.ModelSerializer):
     id = serializers.CharField(
         read_only=True, source='recipe.id',
@@ -229,3 +320,11 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShoppingCart
         fields = ('id', 'cooking_time', 'name', 'image')
+
+
+class CheckoutJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(read_only=True, source='id')
+
+    class Meta:
+        model = CheckoutJob
+        fields = ('job_id', 'status', 'order_uuid', 'error', 'created')
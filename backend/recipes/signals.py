@@ -0,0 +1,101 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.models import CustomUser, Follow
+
+from .cache import bump_generation
+from .counters import COUNTERS, count_instance
+from .coverage_index import record_recipe_changes
+from .feed import schedule_backfill
+from .models import (FavoriteRecipe, Ingredient, IngredientsRecipe, Recipe,
+                     RemovedInteraction, ShoppingCart, Tag, TagsRecipe)
+from .search import schedule_search_refresh
+
+# Cached responses of each resource, keyed by the models they render.
+GENERATIONS = {
+    Recipe: 'recipes',
+    IngredientsRecipe: 'recipes',
+    TagsRecipe: 'recipes',
+    Tag: 'tags',
+    Ingredient: 'ingredients',
+    CustomUser: 'users',
+}
+
+
+def bump_cached_generation(sender, **kwargs):
+    resource = GENERATIONS[sender]
+    if kwargs.get('update_fields') == frozenset(['last_login']):
+        return
+    # Bump after commit so a concurrent read cannot cache the old rows
+    # under the new generation.
+    transaction.on_commit(lambda: bump_generation(resource))
+
+
+# Connected per model: a receiver for every sender would make Django
+# fetch rows before each bulk delete just to send the signals.
+for model in GENERATIONS:
+    post_save.connect(bump_cached_generation, sender=model)
+    post_delete.connect(bump_cached_generation, sender=model)
+
+
+def count_created(sender, instance, created, raw=False, **kwargs):
+    # Fixtures already carry their counters.
+    if created and not raw:
+        count_instance(instance, 1)
+
+
+def count_deleted(sender, instance, **kwargs):
+    count_instance(instance, -1)
+
+
+# Counting in signals keeps the counters right for admin edits and
+# cascades too. Rows written with bulk_create or queryset.update()
+# bypass them; `manage.py recount` repairs those.
+for _, _, counted_model, _ in COUNTERS:
+    post_save.connect(count_created, sender=counted_model)
+    post_delete.connect(count_deleted, sender=counted_model)
+
+
+# Connected after count_deleted, so followers_count is already lowered.
+@receiver(post_delete, sender=Follow)
+def backfill_feed(sender, instance, **kwargs):
+    schedule_backfill(instance.author_id)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingCart)
+def record_removed_interaction(sender, instance, **kwargs):
+    RemovedInteraction.objects.create(
+        user_id=instance.user_id, recipe_id=instance.recipe_id
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def refresh_recipe_indexes(sender, instance, **kwargs):
+    # The search refresh runs on commit, after the serializer has written
+    # the ingredients; the change log entry commits with the recipe.
+    schedule_search_refresh([instance.pk])
+    record_recipe_changes([instance.pk])
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_search(sender, instance, created, **kwargs):
+    if created:
+        return
+    schedule_search_refresh(
+        IngredientsRecipe.objects.filter(
+            ingredient=instance
+        ).values_list('recipe_id', flat=True)
+    )
+
+
+@receiver(pre_delete, sender=Ingredient)
+def refresh_ingredient_recipes(sender, instance, **kwargs):
+    # Collected before the cascade removes the ingredient rows.
+    recipe_ids = list(IngredientsRecipe.objects.filter(
+        ingredient=instance
+    ).values_list('recipe_id', flat=True))
+    schedule_search_refresh(recipe_ids)
+    record_recipe_changes(recipe_ids)
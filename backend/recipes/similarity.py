@@ -0,0 +1,244 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import (FavoriteRecipe, RemovedInteraction, ShoppingCart,
+                     SimilarRecipe)
+
+# A cart entry is weaker evidence of taste than a favorite.
+FAVORITE_WEIGHT = 1.0
+CART_WEIGHT = 0.5
+# Recipes written per transaction.
+MAX_CHUNK_TARGETS = 1000
+# SQLite caps a compound INSERT at 500 rows.
+INSERT_BATCH_SIZE = 500
+
+
+def fetch_pairs(model):
+    rows = model.objects.order_by().values_list('user_id', 'recipe_id')
+    pairs = np.fromiter(
+        (value for row in rows.iterator() for value in row), dtype=np.int64
+    )
+    return pairs[0::2], pairs[1::2]
+
+
+class InteractionMatrix:
+    """
+    Sparse user x recipe matrix in coordinate form.
+
+    Every recipe column is L2-normalised, so the dot product of two
+    columns is their cosine similarity. Entries are kept sorted both by
+    recipe and by user, which turns "all users of these recipes" and "all
+    recipes of these users" into slices.
+    """
+
+    def __init__(self, users, recipes, weights):
+        # A recipe that is both favorited and in the cart counts once,
+        # with the weights added up.
+        width = recipes.max(initial=0) + 1
+        key, inverse = np.unique(users * width + recipes, return_inverse=True)
+        weights = np.bincount(inverse, weights=weights)
+        users, recipes = key // width, key % width
+        self.recipe_ids, recipe_index = np.unique(
+            recipes, return_inverse=True
+        )
+        self.user_ids, user_index = np.unique(users, return_inverse=True)
+        norms = np.sqrt(np.bincount(recipe_index, weights=weights ** 2))
+        weights = weights / norms[recipe_index]
+
+        by_recipe = np.argsort(recipe_index, kind='stable')
+        self.recipe_users = user_index[by_recipe]
+        self.recipe_weights = weights[by_recipe]
+        self.recipe_starts = np.searchsorted(
+            recipe_index[by_recipe], np.arange(len(self.recipe_ids) + 1)
+        )
+
+        by_user = np.argsort(user_index, kind='stable')
+        self.user_recipes = recipe_index[by_user]
+        self.user_weights = weights[by_user]
+        self.user_starts = np.searchsorted(
+            user_index[by_user], np.arange(len(self.user_ids) + 1)
+        )
+        user_degrees = np.diff(self.user_starts)
+        # Number of (target, neighbour) products each recipe expands to.
+        self.costs = np.bincount(
+            recipe_index, weights=user_degrees[user_index],
+            minlength=len(self.recipe_ids),
+        ).astype(np.int64)
+
+    @classmethod
+    def load(cls):
+        favorite_users, favorite_recipes = fetch_pairs(FavoriteRecipe)
+        cart_users, cart_recipes = fetch_pairs(ShoppingCart)
+        return cls(
+            np.concatenate([favorite_users, cart_users]),
+            np.concatenate([favorite_recipes, cart_recipes]),
+            np.concatenate([
+                np.full(len(favorite_users), FAVORITE_WEIGHT),
+                np.full(len(cart_users), CART_WEIGHT),
+            ]),
+        )
+
+    def expand(self, starts, ends):
+        """Concatenate the index ranges [start, end) into one array."""
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return np.arange(lengths.sum()) + offsets
+
+    def neighbours(self, targets):
+        """Return every recipe sharing a user with `targets`, themselves included."""
+        entries = self.expand(
+            self.recipe_starts[targets], self.recipe_starts[targets + 1]
+        )
+        users = np.unique(self.recipe_users[entries])
+        return np.unique(self.user_recipes[self.expand(
+            self.user_starts[users], self.user_starts[users + 1]
+        )])
+
+    def recipes_of(self, user_ids):
+        """Return every recipe of the given users."""
+        users = np.flatnonzero(np.isin(self.user_ids, user_ids))
+        return np.unique(self.user_recipes[self.expand(
+            self.user_starts[users], self.user_starts[users + 1]
+        )])
+
+    def top_similar(self, targets, top_n):
+        """
+        Return (target, similar, score) index arrays holding the `top_n`
+        most similar recipes of every target, best first.
+        """
+        counts = np.diff(self.recipe_starts)[targets]
+        entries = self.expand(
+            self.recipe_starts[targets], self.recipe_starts[targets + 1]
+        )
+        local = np.repeat(np.arange(len(targets)), counts)
+        users = self.recipe_users[entries]
+        weights = self.recipe_weights[entries]
+
+        degrees = self.user_starts[users + 1] - self.user_starts[users]
+        products = self.expand(
+            self.user_starts[users], self.user_starts[users + 1]
+        )
+        local = np.repeat(local, degrees)
+        similar = self.user_recipes[products]
+        scores = np.repeat(weights, degrees) * self.user_weights[products]
+
+        keep = similar != targets[local]
+        local, similar, scores = local[keep], similar[keep], scores[keep]
+        key, inverse = np.unique(
+            local * len(self.recipe_ids) + similar, return_inverse=True
+        )
+        scores = np.bincount(inverse, weights=scores)
+        local = key // len(self.recipe_ids)
+        similar = key % len(self.recipe_ids)
+
+        order = np.lexsort((similar, -scores, local))
+        local, similar, scores = local[order], similar[order], scores[order]
+        group_starts = np.searchsorted(local, np.arange(len(targets)))
+        ranks = np.arange(len(local)) - group_starts[local]
+        keep = ranks < top_n
+        return targets[local[keep]], similar[keep], scores[keep]
+
+    def chunks(self, targets, max_products, max_targets):
+        """
+        Split targets so that no chunk expands past `max_products` or
+        holds more than `max_targets` recipes.
+        """
+        costs = np.cumsum(self.costs[targets])
+        start = 0
+        while start < len(targets):
+            base = costs[start - 1] if start else 0
+            end = min(
+                max(
+                    start + 1,
+                    int(np.searchsorted(costs, base + max_products, 'right')),
+                ),
+                start + max_targets,
+            )
+            yield targets[start:end]
+            start = end
+
+
+def last_run():
+    return SimilarRecipe.objects.aggregate(last=Max('computed_at'))['last']
+
+
+def changed_recipes(since):
+    """
+    Return (recipe ids, user ids) of the favorites and cart entries added
+    or removed at or after `since`; user ids are those of removals only.
+    """
+    recipe_ids = set()
+    for model in (FavoriteRecipe, ShoppingCart):
+        recipe_ids.update(model.objects.filter(
+            created__gte=since
+        ).values_list('recipe_id', flat=True).distinct())
+    user_ids = set()
+    for user_id, recipe_id in RemovedInteraction.objects.filter(
+        created__gte=since
+    ).values_list('user_id', 'recipe_id'):
+        user_ids.add(user_id)
+        recipe_ids.add(recipe_id)
+    return recipe_ids, user_ids
+
+
+def compute_similar_recipes(top_n, max_products, full=False, log=None):
+    """
+    Rebuild SimilarRecipe rows; returns the number of recipes refreshed.
+
+    An incremental run refreshes the recipes that gained or lost favorites
+    or cart entries since the previous run, plus every recipe sharing a
+    user with them, since their similarity to the changed recipes moved
+    as well. A removed entry no longer links its user to the recipe, so
+    that user's other recipes are refreshed too.
+    """
+    started = timezone.now()
+    previous = last_run()
+    since = None if full else previous
+    matrix = InteractionMatrix.load()
+    if since is None:
+        targets = np.arange(len(matrix.recipe_ids))
+    else:
+        recipe_ids, user_ids = changed_recipes(since)
+        changed = np.flatnonzero(np.isin(matrix.recipe_ids, list(recipe_ids)))
+        targets = np.union1d(
+            matrix.neighbours(changed) if len(changed) else changed,
+            matrix.recipes_of(list(user_ids)),
+        )
+        # Recipes left without any interaction have no neighbours.
+        SimilarRecipe.objects.filter(
+            recipe_id__in=recipe_ids - set(matrix.recipe_ids.tolist())
+        ).delete()
+    refreshed = 0
+    for chunk in matrix.chunks(targets, max_products, MAX_CHUNK_TARGETS):
+        recipes, similar, scores = matrix.top_similar(chunk, top_n)
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(
+                recipe_id__in=matrix.recipe_ids[chunk].tolist()
+            ).delete()
+            SimilarRecipe.objects.bulk_create(
+                (
+                    SimilarRecipe(
+                        recipe_id=recipe_id, similar_id=similar_id,
+                        score=score, computed_at=started,
+                    )
+                    for recipe_id, similar_id, score in zip(
+                        matrix.recipe_ids[recipes].tolist(),
+                        matrix.recipe_ids[similar].tolist(),
+                        scores.tolist(),
+                    )
+                ),
+                batch_size=INSERT_BATCH_SIZE,
+            )
+        refreshed += len(chunk)
+        if log is not None:
+            log(f'{refreshed}/{len(targets)} recipes')
+    if since is None:
+        # Every recipe with interactions was rewritten above; whatever is
+        # older belongs to recipes that lost all of them.
+        SimilarRecipe.objects.filter(computed_at__lt=started).delete()
+    if previous is not None:
+        # Removals logged before the previous run were applied by it.
+        RemovedInteraction.objects.filter(created__lt=previous).delete()
+    return refreshed
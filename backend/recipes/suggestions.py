@@ -0,0 +1,318 @@
+import abc
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import openai
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .renderers import sse_event
+
+logger = logging.getLogger(__name__)
+
+
+class SuggestionError(Exception):
+    """The provider failed or returned something unusable."""
+
+
+class SuggestionTimeout(SuggestionError):
+    """No suggestion arrived within AI_SUGGESTION_TIMEOUT seconds."""
+
+
+class SuggestionProvider(abc.ABC):
+    """
+    Turns a prompt into a suggestion text.
+
+    Set AI_SUGGESTION_PROVIDER to the dotted path of a subclass to swap the
+    backend; `suggest` must honour `timeout` and raise SuggestionError.
+    Providers that can stream override `stream` to yield text as it is
+    generated; closing the returned generator must abort the request.
+    """
+
+    @abc.abstractmethod
+    def suggest(self, prompt, timeout):
+        """Return the suggestion text for `prompt`."""
+
+    def stream(self, prompt, timeout):
+        yield self.suggest(prompt, timeout)
+
+
+class OpenAIProvider(SuggestionProvider):
+
+    def suggest(self, prompt, timeout):
+        try:
+            response = openai.ChatCompletion.create(
+                api_key=settings.OPENAI_API_KEY,
+                model=settings.AI_SUGGESTION_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=200,
+                request_timeout=timeout,
+            )
+        except Exception as error:
+            raise SuggestionError("Error interacting with OpenAI API") from error
+        try:
+            return response["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            raise SuggestionError("Unexpected response format from OpenAI")
+
+    def stream(self, prompt, timeout):
+        try:
+            chunks = openai.ChatCompletion.create(
+                api_key=settings.OPENAI_API_KEY,
+                model=settings.AI_SUGGESTION_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=200,
+                request_timeout=timeout,
+                stream=True,
+            )
+        except Exception as error:
+            raise SuggestionError("Error interacting with OpenAI API") from error
+        try:
+            for chunk in chunks:
+                try:
+                    text = chunk["choices"][0]["delta"].get("content")
+                except (KeyError, IndexError, TypeError, AttributeError):
+                    raise SuggestionError(
+                        "Unexpected response format from OpenAI"
+                    )
+                if text:
+                    yield text
+        except SuggestionError:
+            raise
+        except Exception as error:
+            raise SuggestionError("Error interacting with OpenAI API") from error
+        finally:
+            # Closing the generator drops the HTTP connection to OpenAI.
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+
+class FakeProvider(SuggestionProvider):
+    """
+    Answers locally, for development and tests without network access.
+
+    `stream` yields the same text word by word, `chunk_delay` seconds
+    apart, and counts how many words were actually produced.
+    """
+    delay = 0
+    chunk_delay = 0
+
+    def __init__(self):
+        self.calls = 0
+        self.streamed_chunks = 0
+        self.lock = threading.Lock()
+
+    def get_text(self, prompt):
+        digest = hashlib.md5(prompt.encode()).hexdigest()[:8]
+        return (
+            f"- Name of Recipe: Fake recipe {digest}\n"
+            f"- Cooking Time: 30 minutes\n"
+        )
+
+    def suggest(self, prompt, timeout):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.get_text(prompt)
+
+    def stream(self, prompt, timeout):
+        with self.lock:
+            self.calls += 1
+        for word in re.findall(r'\S+\s*', self.get_text(prompt)):
+            time.sleep(self.chunk_delay)
+            with self.lock:
+                self.streamed_chunks += 1
+            yield word
+
+
+class SuggestionCache:
+    """Thread-safe LRU of suggestions whose entries expire after `ttl`."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def normalize_ingredients(ingredients):
+    """
+    Return the ingredient set as a sorted, case-folded tuple.
+
+    Accepts a comma separated string or a list, so "Eggs, milk" and
+    ["milk", "eggs"] share one cache entry.
+    """
+    if isinstance(ingredients, str):
+        ingredients = ingredients.split(',')
+    if not isinstance(ingredients, (list, tuple)):
+        return ()
+    return tuple(sorted({
+        str(name).strip().casefold() for name in ingredients
+        if str(name).strip()
+    }))
+
+
+class SuggestionService:
+    """
+    Caches suggestions per ingredient set and coalesces concurrent misses.
+
+    The first miss for a key submits one provider call to the pool; every
+    request for that key waits on the same future until it finishes or the
+    timeout passes. A call that outlives the timeout still fills the cache.
+    """
+
+    def __init__(self, provider=None):
+        self.provider = provider or import_string(
+            settings.AI_SUGGESTION_PROVIDER
+        )()
+        self.timeout = settings.AI_SUGGESTION_TIMEOUT
+        self.cache = SuggestionCache(
+            settings.AI_SUGGESTION_CACHE_SIZE,
+            settings.AI_SUGGESTION_CACHE_TTL,
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.AI_SUGGESTION_WORKERS,
+            thread_name_prefix='ai-suggestions',
+        )
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def get_prompt(self, ingredients):
+        return settings.AI_SUGGESTION_PROMPT_TEMPLATE.format(
+            ingredients=', '.join(ingredients)
+        )
+
+    def call(self, key):
+        try:
+            suggestion = self.provider.suggest(
+                self.get_prompt(key), self.timeout
+            )
+            self.cache.set(key, suggestion)
+            return suggestion
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+
+    def suggest(self, ingredients):
+        """Return (suggestion, cached) for a normalized ingredient tuple."""
+        suggestion = self.cache.get(ingredients)
+        if suggestion is not None:
+            return suggestion, True
+        with self.lock:
+            future = self.in_flight.get(ingredients)
+            if future is None:
+                # The call may have finished since the lookup above.
+                suggestion = self.cache.get(ingredients)
+                if suggestion is not None:
+                    return suggestion, True
+                future = self.executor.submit(self.call, ingredients)
+                self.in_flight[ingredients] = future
+        try:
+            return future.result(timeout=self.timeout), False
+        except FutureTimeoutError:
+            logger.warning("AI suggestion timed out for %s", ingredients)
+            raise SuggestionTimeout("The suggestion service timed out")
+        except SuggestionError:
+            raise
+        except Exception as error:
+            logger.exception("AI suggestion failed for %s", ingredients)
+            raise SuggestionError("Error interacting with OpenAI API") from error
+
+    def stream(self, ingredients):
+        """
+        Yield (text, cached) pieces of the suggestion as they are generated.
+
+        A cached suggestion comes back as a single piece. Otherwise the
+        provider streams directly, bypassing coalescing, and the complete
+        text is cached once it has finished; closing this generator closes
+        the provider stream, so a client disconnect cancels generation.
+        """
+        suggestion = self.cache.get(ingredients)
+        if suggestion is not None:
+            yield suggestion, True
+            return
+        deadline = time.monotonic() + self.timeout
+        chunks = self.provider.stream(self.get_prompt(ingredients), self.timeout)
+        parts = []
+        try:
+            for text in chunks:
+                if time.monotonic() > deadline:
+                    logger.warning(
+                        "AI suggestion stream timed out for %s", ingredients
+                    )
+                    raise SuggestionTimeout("The suggestion service timed out")
+                parts.append(text)
+                yield text, False
+        except SuggestionError:
+            raise
+        except Exception as error:
+            logger.exception("AI suggestion failed for %s", ingredients)
+            raise SuggestionError("Error interacting with OpenAI API") from error
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+        self.cache.set(ingredients, ''.join(parts))
+
+
+def iter_suggestion_events(service, ingredients):
+    """
+    Yield the suggestion as Server-Sent Events.
+
+    Each piece of text is a `data: {"delta": ...}` message, followed by a
+    `done` event, or an `error` event if generation fails midway.
+    """
+    # A comment goes out at once, so headers reach the client before the
+    # provider has produced anything.
+    yield b': stream opened\n\n'
+    cached = False
+    try:
+        for text, cached in service.stream(ingredients):
+            yield sse_event({'delta': text})
+    except SuggestionError as error:
+        yield sse_event({'error': str(error)}, 'error')
+        return
+    yield sse_event({'cached': cached}, 'done')
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_suggestion_service():
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = SuggestionService()
+    return _service
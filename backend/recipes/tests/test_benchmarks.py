@@ -0,0 +1,90 @@
+import os
+
+import pytest
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from recipes.benchmark import (BASELINE_PATH, DATASETS, ENDPOINTS,
+                               REFERENCE_ENDPOINT, compare, endpoint_url,
+                               load_baseline, measure, normalize,
+                               save_baseline, seed)
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+
+@pytest.fixture(scope='module')
+def dataset(request):
+    dataset = request.config.getoption('benchmark_dataset')
+    if dataset not in DATASETS:
+        raise pytest.UsageError(
+            f'--benchmark-dataset must be one of {", ".join(DATASETS)}'
+        )
+    return dataset
+
+
+@pytest.fixture(scope='module')
+def benchmark_values(dataset, django_db_setup, django_db_blocker):
+    # The dataset is rolled back once the module is done, so the other
+    # tests still start from an empty database. Responses are measured
+    # without the response cache.
+    with django_db_blocker.unblock(), transaction.atomic(), \
+            override_settings(RESPONSE_CACHE_ENABLED=False):
+        yield seed(dataset)
+        transaction.set_rollback(True)
+
+
+@pytest.fixture(scope='module')
+def clients(benchmark_values):
+    authenticated = APIClient()
+    authenticated.force_authenticate(benchmark_values['user'])
+    return {False: APIClient(), True: authenticated}
+
+
+@pytest.fixture(scope='module')
+def reference_ms(request, benchmark_values, clients):
+    _, url_name, kwargs, query, login = next(
+        endpoint for endpoint in ENDPOINTS if endpoint[0] == REFERENCE_ENDPOINT
+    )
+    return measure(
+        clients[login],
+        endpoint_url(url_name, kwargs, query, benchmark_values),
+        request.config.getoption('benchmark_runs'),
+    )['p50_ms']
+
+
+@pytest.fixture(scope='module')
+def baseline(request, dataset):
+    baseline = load_baseline(BASELINE_PATH)
+    update = request.config.getoption('benchmark_update_baseline')
+    results = baseline.setdefault(dataset, {}) if update else None
+    yield baseline.get(dataset, {}), results
+    if update:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        save_baseline(BASELINE_PATH, baseline)
+
+
+@pytest.mark.parametrize(
+    'name, url_name, kwargs, query, login', ENDPOINTS,
+    ids=[endpoint[0] for endpoint in ENDPOINTS],
+)
+def test_endpoint(request, benchmark_values, clients, reference_ms, baseline,
+                  name, url_name, kwargs, query, login):
+    metrics = measure(
+        clients[login], endpoint_url(url_name, kwargs, query, benchmark_values),
+        request.config.getoption('benchmark_runs'),
+    )
+    result = normalize(metrics, reference_ms)
+    base, results = baseline
+    if results is not None:
+        results[name] = result
+        return
+    if name not in base:
+        pytest.skip(
+            f'no baseline for {name}; run with --benchmark-update-baseline'
+        )
+    regressions = compare(
+        name, result, base[name],
+        request.config.getoption('benchmark_threshold'),
+    )
+    assert not regressions, '\n'.join(regressions)
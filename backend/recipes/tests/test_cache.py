@@ -0,0 +1,135 @@
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from recipes.models import (Ingredient, IngredientsRecipe, Recipe, Tag,
+                            TagsRecipe)
+from users.models import CustomUser
+
+
+class CacheInvalidationTests(TransactionTestCase):
+    """Generations are bumped on commit, so these tests really commit."""
+
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='pass'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='recipe', text='text', cooking_time=10,
+            image='recipes/image.png'
+        )
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def cache_status(self, url):
+        response = self.anonymous.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['X-Cache']
+
+    def test_counter_changes_keep_cached_pages(self):
+        url = reverse('recipes-list')
+        self.assertEqual(self.cache_status(url), 'MISS')
+        recipe_url = reverse('recipes-detail', kwargs={'pk': self.recipe.pk})
+        for method in ('post', 'delete'):
+            getattr(self.client, method)(f'{recipe_url}favorite/')
+            getattr(self.client, method)(f'{recipe_url}shopping_cart/')
+        self.assertEqual(self.cache_status(url), 'HIT')
+
+    def test_counter_orderings_are_not_cached(self):
+        for ordering in ('-favorites_count', 'pub_date,in_carts_count'):
+            url = f'{reverse("recipes-list")}?ordering={ordering}'
+            with self.subTest(ordering=ordering):
+                for _ in range(2):
+                    response = self.anonymous.get(url)
+                    self.assertNotIn('X-Cache', response)
+
+
+class ResponseCacheTests(TransactionTestCase):
+
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='pass'
+        )
+        self.tag = Tag.objects.create(name='tag', color='#000000', slug='tag')
+        self.ingredient = Ingredient.objects.create(
+            name='salt', measurement_unit='g'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='recipe', text='text', cooking_time=10,
+            image='recipes/image.png'
+        )
+        self.url = reverse('recipes-list')
+        self.anonymous = APIClient()
+
+    def cache_status(self, url=None):
+        response = self.anonymous.get(url or self.url)
+        self.assertEqual(response.status_code, 200)
+        return response['X-Cache']
+
+    def test_hit_and_miss(self):
+        self.assertEqual(self.cache_status(), 'MISS')
+        self.assertEqual(self.cache_status(), 'HIT')
+        self.assertEqual(self.cache_status(f'{self.url}?page=1'), 'MISS')
+        detail = reverse('recipes-detail', kwargs={'pk': self.recipe.pk})
+        self.assertEqual(self.cache_status(detail), 'MISS')
+        self.assertEqual(self.cache_status(detail), 'HIT')
+
+    def test_authenticated_requests_skip_the_cache(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        self.cache_status()
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Cache', response)
+
+    def test_writes_invalidate(self):
+        other_tag = Tag.objects.create(
+            name='other', color='#ffffff', slug='other'
+        )
+        writes = {
+            'recipe': lambda: Recipe.objects.get(pk=self.recipe.pk).save(),
+            'tag': lambda: Tag.objects.get(pk=self.tag.pk).save(),
+            'ingredient': lambda: Ingredient.objects.get(
+                pk=self.ingredient.pk
+            ).save(),
+            'tags through table': lambda: TagsRecipe.objects.create(
+                recipe=self.recipe, tag=other_tag
+            ),
+            'ingredients through table': (
+                lambda: IngredientsRecipe.objects.create(
+                    recipe=self.recipe, ingredient=self.ingredient, amount=1
+                )
+            ),
+        }
+        for name, write in writes.items():
+            with self.subTest(write=name):
+                self.cache_status()
+                self.assertEqual(self.cache_status(), 'HIT')
+                write()
+                self.assertEqual(self.cache_status(), 'MISS')
+
+    def test_signups_keep_recipe_pages(self):
+        self.cache_status()
+        CustomUser.objects.create_user(
+            username='new', email='new@example.com', password='pass'
+        )
+        self.assertEqual(self.cache_status(), 'HIT')
+
+    def test_stats(self):
+        staff = CustomUser.objects.create_user(
+            username='staff', email='staff@example.com', password='pass',
+            is_staff=True,
+        )
+        client = APIClient()
+        client.force_authenticate(staff)
+        before = client.get(reverse('stats')).data['response_cache']
+        self.cache_status()
+        self.cache_status()
+        stats = client.get(reverse('stats')).data
+        after = stats['response_cache']
+        self.assertIn('requests', stats['grocery_service'])
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        client.force_authenticate(self.author)
+        self.assertEqual(client.get(reverse('stats')).status_code, 403)
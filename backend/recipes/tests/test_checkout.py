@@ -0,0 +1,124 @@
+import json
+import uuid
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.checkout import claim_jobs, enqueue_checkout, process_job
+from recipes.models import CheckoutJob
+from users.models import CustomUser
+
+ITEMS = [{'name': 'Milk', 'quantity': 2, 'unit': 'l'}]
+
+
+class FakeGroceryService:
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def create_shopping_list(self, items, idempotency_key=None):
+        self.calls.append((items, idempotency_key))
+        return self.responses.pop(0)
+
+
+@override_settings(
+    CHECKOUT_MAX_ATTEMPTS=2, CHECKOUT_RETRY_DELAY=30,
+    CHECKOUT_STALE_AFTER=300,
+)
+class CheckoutTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass'
+        )
+
+    def age(self, job, seconds):
+        CheckoutJob.objects.filter(pk=job.pk).update(
+            claimed_at=timezone.now() - timedelta(seconds=seconds)
+        )
+
+    def test_same_idempotency_key_returns_the_same_job(self):
+        first = enqueue_checkout(self.user, ITEMS, 'key')
+        self.assertEqual(enqueue_checkout(self.user, ITEMS, 'key'), first)
+        self.assertNotEqual(enqueue_checkout(self.user, ITEMS), first)
+        self.assertEqual(CheckoutJob.objects.count(), 2)
+
+    def test_claim_skips_claimed_and_retrying_jobs(self):
+        job = enqueue_checkout(self.user, ITEMS)
+        self.assertEqual(claim_jobs(10), [job])
+        # Processing and not stale yet.
+        self.assertEqual(claim_jobs(10), [])
+        CheckoutJob.objects.filter(pk=job.pk).update(
+            status=CheckoutJob.PENDING
+        )
+        # Pending, but the retry delay has not passed.
+        self.assertEqual(claim_jobs(10), [])
+        self.age(job, 31)
+        [job] = claim_jobs(10)
+        self.assertEqual(job.status, CheckoutJob.PROCESSING)
+        self.assertEqual(job.attempts, 2)
+        self.age(job, 301)
+        self.assertEqual(claim_jobs(10), [job])
+
+    def test_claim_respects_batch_size(self):
+        jobs = [enqueue_checkout(self.user, ITEMS) for _ in range(3)]
+        self.assertEqual(claim_jobs(2), jobs[:2])
+        self.assertEqual(claim_jobs(2), jobs[2:])
+
+    def test_retry_then_fail(self):
+        job = enqueue_checkout(self.user, ITEMS)
+        service = FakeGroceryService({'error': 'down'}, {'error': 'down'})
+        [job] = claim_jobs(10)
+        job = process_job(job, service)
+        self.assertEqual(job.status, CheckoutJob.PENDING)
+        self.assertEqual(job.error, 'down')
+        self.age(job, 31)
+        [job] = claim_jobs(10)
+        job = process_job(job, service)
+        self.assertEqual(job.status, CheckoutJob.FAILED)
+        self.assertIsNotNone(job.finished_at)
+        # Every attempt sends the job id as the idempotency key.
+        self.assertEqual(service.calls, [(ITEMS, str(job.pk))] * 2)
+        self.age(job, 301)
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_done(self):
+        enqueue_checkout(self.user, ITEMS)
+        [job] = claim_jobs(10)
+        job = process_job(job, FakeGroceryService({'order_uuid': 'order'}))
+        job.refresh_from_db()
+        self.assertEqual(job.status, CheckoutJob.DONE)
+        self.assertEqual(job.order_uuid, 'order')
+        self.assertEqual(json.loads(job.items), ITEMS)
+
+
+class CheckoutStatusTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass'
+        )
+        cls.job = enqueue_checkout(cls.user, ITEMS)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, job_id):
+        return self.client.get(f'{reverse("recipes-list")}checkout/{job_id}/')
+
+    def test_status(self):
+        response = self.get(self.job.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], CheckoutJob.PENDING)
+
+    def test_unknown_or_malformed_ids_are_not_found(self):
+        for job_id in (uuid.uuid4(), 'abc', '---', 'deadbeef'):
+            with self.subTest(job_id=job_id):
+                self.assertEqual(self.get(job_id).status_code, 404)
@@ -0,0 +1,84 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from recipes.counters import recount
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart
+from users.models import CustomUser, Follow
+
+
+class CounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='pass'
+        )
+        cls.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='pass'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='recipe', text='text', cooking_time=10,
+            image='recipes/image.png'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def assert_counts(self, **expected):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        author = CustomUser.objects.get(pk=self.author.pk)
+        self.assertEqual({
+            'favorites_count': recipe.favorites_count,
+            'in_carts_count': recipe.in_carts_count,
+            'recipes_count': author.recipes_count,
+            'followers_count': author.followers_count,
+        }, {
+            'favorites_count': 0, 'in_carts_count': 0, 'recipes_count': 1,
+            'followers_count': 0, **expected,
+        })
+        # The maintained values are what a full recount computes.
+        self.assertEqual(set(recount().values()), {0})
+
+    def test_api_actions(self):
+        recipe_url = reverse('recipes-detail', kwargs={'pk': self.recipe.pk})
+        subscribe_url = reverse(
+            'users-subscribe', kwargs={'id': self.author.pk}
+        )
+        for _ in range(2):
+            self.client.post(f'{recipe_url}favorite/')
+            self.client.post(f'{recipe_url}shopping_cart/')
+        self.client.post(subscribe_url)
+        self.assert_counts(
+            favorites_count=1, in_carts_count=1, followers_count=1
+        )
+        for _ in range(2):
+            self.client.delete(f'{recipe_url}favorite/')
+            self.client.delete(f'{recipe_url}shopping_cart/')
+        self.client.delete(subscribe_url)
+        self.assert_counts()
+
+    def test_orm_writes_and_cascades(self):
+        FavoriteRecipe.objects.create(user=self.reader, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.reader, recipe=self.recipe)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Recipe.objects.create(
+            author=self.author, name='second', text='text', cooking_time=10,
+            image='recipes/image.png'
+        )
+        self.assert_counts(
+            favorites_count=1, in_carts_count=1, followers_count=1,
+            recipes_count=2,
+        )
+        Recipe.objects.get(name='second').delete()
+        self.reader.delete()
+        self.assert_counts()
+
+    def test_counters_are_not_rendered(self):
+        response = self.client.get(
+            reverse('recipes-detail', kwargs={'pk': self.recipe.pk})
+        )
+        for field in ('favorites_count', 'in_carts_count',
+                      'has_image_variants', 'pub_date', 'search_vector'):
+            self.assertNotIn(field, response.data)
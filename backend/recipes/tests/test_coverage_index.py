@@ -0,0 +1,185 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from recipes.cache import bump_generation, get_generation
+from recipes.coverage_index import (MAX_MISSING, CoverageState,
+                                    RecipeCoverageIndex,
+                                    prune_recipe_changes)
+from recipes.models import Ingredient, IngredientsRecipe, Recipe, RecipeChange
+from users.models import CustomUser
+
+
+class PruneRecipeChangesTests(TestCase):
+
+    def setUp(self):
+        RecipeChange.objects.bulk_create(
+            RecipeChange(recipe_id=recipe_id) for recipe_id in range(4)
+        )
+        RecipeChange.objects.filter(recipe_id__lt=2).update(
+            created=timezone.now() - timedelta(days=2)
+        )
+
+    def test_build_keeps_the_log(self):
+        RecipeCoverageIndex().build('generation')
+        self.assertEqual(RecipeChange.objects.count(), 4)
+
+    def test_prune(self):
+        self.assertEqual(prune_recipe_changes(24 * 3600), 2)
+        self.assertEqual(
+            sorted(RecipeChange.objects.values_list('recipe_id', flat=True)),
+            [2, 3],
+        )
+
+    def test_command_rejects_short_retention(self):
+        with self.assertRaises(CommandError):
+            call_command('prune_recipe_changes', retention=1)
+
+
+class CoverageIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(
+            username='cook', email='cook@example.com', password='pass'
+        )
+        cls.a, cls.b, cls.c, cls.d = (
+            Ingredient.objects.create(name=name, measurement_unit='g')
+            for name in 'abcd'
+        )
+        cls.recipes = {}
+        # Fillers keep the dead ratio low while single recipes change.
+        fillers = [(cls.d,)] * 8
+        for name, ingredients in [
+            ('both', (cls.a, cls.b)),
+            ('a', (cls.a,)),
+            ('abc', (cls.a, cls.b, cls.c)),
+            ('ac', (cls.a, cls.c)),
+            ('newer a', (cls.a,)),
+            *((f'filler {number}', items)
+              for number, items in enumerate(fillers)),
+        ]:
+            recipe = Recipe.objects.create(
+                author=author, name=name, text='text', cooking_time=10,
+                image='recipes/image.png',
+            )
+            IngredientsRecipe.objects.bulk_create(
+                IngredientsRecipe(recipe=recipe, ingredient=ingredient)
+                for ingredient in ingredients
+            )
+            cls.recipes[name] = recipe.pk
+
+    def setUp(self):
+        self.index = RecipeCoverageIndex()
+        self.pantry = [self.a.pk, self.b.pk]
+
+    def ranked(self, **kwargs):
+        return [
+            recipe_id for recipe_id, _, _, _
+            in self.index.rank(self.pantry, 20, **kwargs)
+        ]
+
+    def ids(self, *names):
+        return [self.recipes[name] for name in names]
+
+    def change(self):
+        # Committing a recipe write bumps the generation.
+        bump_generation('recipes')
+
+    def test_rank(self):
+        self.assertEqual(
+            self.ranked(), self.ids('both', 'newer a', 'a', 'abc', 'ac')
+        )
+        self.assertEqual(
+            self.ranked(max_missing=0), self.ids('both', 'newer a', 'a')
+        )
+        self.assertEqual(
+            self.index.rank(self.pantry, 2),
+            [(self.recipes['both'], 2, 0, []),
+             (self.recipes['newer a'], 1, 0, [])],
+        )
+        self.assertEqual(
+            self.index.rank(self.pantry, 20)[3],
+            (self.recipes['abc'], 2, 1, [self.c.pk]),
+        )
+        self.assertEqual(self.index.rank([self.c.pk + 100], 20), [])
+        self.assertEqual(self.index.rank(self.pantry, 0), [])
+
+    def test_changes_are_applied_without_rebuild(self):
+        self.ranked()
+        IngredientsRecipe.objects.create(
+            recipe_id=self.recipes['a'], ingredient=self.c
+        )
+        Recipe.objects.get(pk=self.recipes['a']).save()
+        Recipe.objects.get(pk=self.recipes['both']).delete()
+        self.change()
+        with mock.patch.object(
+            self.index, 'build', side_effect=AssertionError('rebuilt')
+        ):
+            self.assertEqual(
+                self.ranked(), self.ids('newer a', 'abc', 'ac', 'a')
+            )
+        state = self.index.state
+        self.assertNotIn(self.recipes['both'], state.slots)
+        self.assertEqual(np.count_nonzero(~state.alive), 2)
+        self.assertEqual(state.generation, get_generation('recipes'))
+
+    def test_applied_changes_are_not_replayed(self):
+        self.ranked()
+        state = self.index.state
+        self.change()
+        self.ranked()
+        # The lookback re-read the changes the build already covered.
+        self.assertIs(self.index.state.postings, state.postings)
+        self.assertIs(self.index.state.ingredients, state.ingredients)
+
+    def test_late_commit_within_lookback_is_applied(self):
+        # A change whose id was taken before the build, but that was
+        # committed only after it.
+        late = RecipeChange.objects.create(recipe_id=self.recipes['a'])
+        RecipeChange.objects.create(recipe_id=self.recipes['ac'])
+        late.delete()
+        self.ranked()
+        IngredientsRecipe.objects.filter(recipe_id=self.recipes['a']).delete()
+        RecipeChange.objects.create(id=late.id, recipe_id=self.recipes['a'])
+        self.change()
+        self.assertNotIn(self.recipes['a'], self.ranked())
+
+    def test_rebuild_once_too_many_slots_are_dead(self):
+        self.ranked()
+        for name in ('both', 'a', 'abc', 'ac'):
+            Recipe.objects.get(pk=self.recipes[name]).delete()
+        self.change()
+        with mock.patch.object(
+            self.index, 'build', wraps=self.index.build
+        ) as build:
+            self.assertEqual(self.ranked(), self.ids('newer a'))
+        build.assert_called_once()
+        self.assertTrue(self.index.state.alive.all())
+
+    def test_sort_key(self):
+        # Largest ids and missing counts past MAX_MISSING still order
+        # correctly inside the packed 64-bit key.
+        big_id = 2 ** 32 - 2
+        ingredients = [(1,), (1,), (1, *range(100, 100 + MAX_MISSING * 2))]
+        postings = {1: np.array([0, 1, 2], dtype=np.int32)}
+        postings.update(
+            (ingredient, np.array([2], dtype=np.int32))
+            for ingredient in ingredients[2][1:]
+        )
+        self.index.state = CoverageState(
+            np.array([5, big_id, 6], dtype=np.int64), ingredients, postings,
+            np.ones(3, dtype=bool), get_generation('recipes'), 0,
+            frozenset(), time.monotonic(),
+        )
+        ranked = self.index.rank([1], 3)
+        self.assertEqual(
+            [(recipe_id, covered, missing)
+             for recipe_id, covered, missing, _ in ranked],
+            [(big_id, 1, 0), (5, 1, 0), (6, 1, MAX_MISSING * 2)],
+        )
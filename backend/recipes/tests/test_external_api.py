@@ -0,0 +1,172 @@
+import importlib.util
+import json
+import os
+import threading
+from http.server import HTTPServer
+from unittest import mock, skipUnless
+
+import requests
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from recipes.checkout import claim_jobs, enqueue_checkout, process_job
+from recipes.external_api import CircuitBreaker, ExternalGroceryService
+from users.models import CustomUser
+
+MOCK_SERVER = os.path.join(
+    os.path.dirname(settings.BASE_DIR), 'external_grocery_service',
+    'grocery_client.py',
+)
+ITEMS = [{'name': 'Milk', 'quantity': 2, 'unit': 'l'}]
+
+
+class FakeResponse:
+
+    def __init__(self, status_code=200, body=b'{}'):
+        self.status_code = status_code
+        self.body = body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                str(self.status_code), response=self
+            )
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class FakeSession:
+
+    def __init__(self, outcome):
+        self.outcome = outcome
+
+    def post(self, *args, **kwargs):
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+@override_settings(
+    EXTERNAL_API_MAX_RETRIES=0, EXTERNAL_API_BREAKER_THRESHOLD=1,
+    EXTERNAL_API_BREAKER_RESET=0,
+)
+class CircuitBreakerProbeTests(SimpleTestCase):
+    """A half-open probe must close or reopen the circuit, whatever fails."""
+
+    def probe(self, outcome):
+        service = ExternalGroceryService(
+            'http://grocery', session=FakeSession(outcome)
+        )
+        service.breaker.state = CircuitBreaker.OPEN
+        service.breaker.opened_at = 0
+        try:
+            service.post('/api/shopping-cart', {})
+        except Exception:
+            pass
+        return service.breaker.state
+
+    def test_success_closes(self):
+        self.assertEqual(self.probe(FakeResponse()), CircuitBreaker.CLOSED)
+
+    def test_client_error_closes(self):
+        self.assertEqual(
+            self.probe(FakeResponse(status_code=400)), CircuitBreaker.CLOSED
+        )
+
+    def test_failures_reopen(self):
+        for outcome in (
+            FakeResponse(status_code=503),
+            FakeResponse(status_code=500),
+            FakeResponse(body=b'<html>'),
+            requests.exceptions.ConnectionError(),
+            requests.exceptions.TooManyRedirects(),
+            requests.exceptions.InvalidURL(),
+            RuntimeError(),
+        ):
+            with self.subTest(outcome=outcome):
+                self.assertEqual(self.probe(outcome), CircuitBreaker.OPEN)
+
+
+def load_mock_server():
+    spec = importlib.util.spec_from_file_location(
+        'grocery_client', MOCK_SERVER
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@skipUnless(os.path.exists(MOCK_SERVER), 'the mock grocery service is missing')
+@override_settings(EXTERNAL_API_MAX_RETRIES=0)
+class MockServerTests(TestCase):
+    """Requests against the bundled mock grocery service."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        class Handler(load_mock_server().MockServerHandler):
+            orders = {}
+
+            def log_message(self, *args):
+                pass
+
+        # run_mock_server() blocks on a fixed port, so its handler is
+        # served from a free port instead.
+        cls.server = HTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.service = ExternalGroceryService(
+            f'http://127.0.0.1:{self.server.server_port}'
+        )
+        self.addCleanup(self.service.session.close)
+
+    def test_idempotency_key(self):
+        first = self.service.create_shopping_list(ITEMS, 'key')
+        self.assertEqual(first['items'], ITEMS)
+        again = self.service.create_shopping_list(ITEMS, 'key')
+        self.assertEqual(again['order_uuid'], first['order_uuid'])
+        other = self.service.create_shopping_list(ITEMS)
+        self.assertNotEqual(other['order_uuid'], first['order_uuid'])
+        stats = self.service.stats.snapshot()
+        self.assertEqual(
+            (stats['requests'], stats['successes'], stats['errors']),
+            (3, 3, 0),
+        )
+        self.assertGreater(stats['latency_max'], 0)
+
+    def test_retried_job_keeps_its_order(self):
+        user = CustomUser.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass'
+        )
+        enqueue_checkout(user, ITEMS)
+        [job] = claim_jobs(10)
+        order_uuid = process_job(job, self.service).order_uuid
+        self.assertTrue(order_uuid)
+        # A worker that lost the response sends the job again.
+        self.assertEqual(
+            process_job(job, self.service).order_uuid, order_uuid
+        )
+
+    def test_stats_endpoint(self):
+        staff = CustomUser.objects.create_user(
+            username='staff', email='staff@example.com', password='pass',
+            is_staff=True,
+        )
+        client = APIClient()
+        client.force_authenticate(staff)
+        with mock.patch('recipes.external_api._service', self.service):
+            self.service.create_shopping_list(ITEMS)
+            stats = client.get(reverse('stats')).data['grocery_service']
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['successes'], 1)
@@ -0,0 +1,164 @@
+from base64 import b64encode
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.feed import fan_out
+from recipes.models import FeedEntry, Recipe
+from users.models import CustomUser, Follow
+
+
+class ImmediateExecutor:
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(fn.__name__)
+        fn(*args)
+
+
+class FeedSetupMixin:
+    """Reader follows `small` through the API and the popular `star`."""
+
+    def create_user(self, username):
+        return CustomUser.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            password='pass'
+        )
+
+    def create_recipe(self, author, minutes_ago):
+        recipe = Recipe.objects.create(
+            author=author, name=f'{author.username} {minutes_ago}',
+            text='text', cooking_time=10, image='recipes/image.png',
+        )
+        Recipe.objects.filter(pk=recipe.pk).update(
+            pub_date=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+        return recipe.pk
+
+    def create_feed(self):
+        self.reader = self.create_user('reader')
+        self.small = self.create_user('small')
+        self.star = self.create_user('star')
+        self.fans = [self.create_user(f'fan{number}') for number in range(2)]
+        for user in (self.reader, *self.fans):
+            Follow.objects.create(user=user, author=self.star)
+        # Newest first, alternating between the two authors.
+        self.recipes = [
+            self.create_recipe(
+                (self.star, self.small)[minutes % 2], minutes
+            )
+            for minutes in range(1, 8)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+        self.subscribe(self.small)
+
+    def subscribe(self, author, method='post'):
+        return getattr(self.client, method)(
+            reverse('users-subscribe', kwargs={'id': author.pk})
+        )
+
+    def entries(self, author):
+        return set(FeedEntry.objects.filter(
+            user=self.reader, author=author
+        ).values_list('recipe_id', flat=True))
+
+    def feed_ids(self, url=None):
+        response = self.client.get(url or reverse('recipes-feed'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [recipe['id'] for recipe in data['results']], data['next']
+
+
+@override_settings(FEED_FANOUT_MAX_FOLLOWERS=3, FEED_BACKFILL=50)
+class FeedTests(FeedSetupMixin, TestCase):
+
+    def setUp(self):
+        self.create_feed()
+
+    def test_follow_backfills_and_unfollow_cleans_up(self):
+        self.assertEqual(self.entries(self.small), set(self.recipes[::2]))
+        self.assertEqual(self.subscribe(self.small, 'delete').status_code, 204)
+        self.assertEqual(self.entries(self.small), set())
+        self.assertEqual(self.feed_ids()[0], self.recipes[1::2])
+
+    def test_popular_authors_are_not_backfilled(self):
+        other = self.create_user('other')
+        self.client.force_authenticate(other)
+        self.subscribe(self.star)
+        self.assertFalse(FeedEntry.objects.filter(user=other).exists())
+
+    def test_pages(self):
+        url, pages, ids = f'{reverse("recipes-feed")}?limit=2', 0, []
+        while url:
+            page, url = self.feed_ids(url)
+            ids += page
+            pages += 1
+        self.assertEqual(ids, self.recipes)
+        self.assertEqual(pages, 4)
+
+    def test_merge_dedupes_entries_of_popular_authors(self):
+        # Entries written while the author was not popular yet.
+        FeedEntry.objects.bulk_create(
+            FeedEntry(user=self.reader, recipe=recipe, author=self.star,
+                      pub_date=recipe.pub_date)
+            for recipe in Recipe.objects.filter(author=self.star)
+        )
+        self.assertEqual(
+            self.feed_ids(f'{reverse("recipes-feed")}?limit=20')[0],
+            self.recipes,
+        )
+
+    def test_malformed_cursor(self):
+        for cursor in (
+            '!!!', b64encode(b'no separator').decode(),
+            b64encode(b'not a date|1').decode(),
+            b64encode(b'2020-01-01T00:00:00|x').decode(),
+            b64encode(b'\xff|1').decode(),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    reverse('recipes-feed'), {'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 404)
+
+
+@override_settings(FEED_FANOUT_MAX_FOLLOWERS=3, FEED_BACKFILL=50)
+class FeedFanOutTests(FeedSetupMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_feed()
+        self.executor = ImmediateExecutor()
+        patcher = mock.patch(
+            'recipes.feed.get_executor', return_value=self.executor
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fan_out_skips_popular_authors(self):
+        FeedEntry.objects.all().delete()
+        for recipe_id in self.recipes:
+            fan_out(recipe_id)
+        self.assertEqual(self.entries(self.small), set(self.recipes[::2]))
+        self.assertEqual(self.entries(self.star), set())
+
+    def test_backfill_when_author_is_no_longer_popular(self):
+        Follow.objects.get(user=self.fans[0], author=self.star).delete()
+        self.assertEqual(self.executor.submitted, ['backfill_followers'])
+        self.assertEqual(self.entries(self.star), set(self.recipes[1::2]))
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.fans[1], author=self.star
+        ).exists())
+        self.assertEqual(
+            self.feed_ids(f'{reverse("recipes-feed")}?limit=20')[0],
+            self.recipes,
+        )
+        # Only the unfollow crossing the threshold backfills.
+        Follow.objects.get(user=self.fans[1], author=self.star).delete()
+        self.assertEqual(self.executor.submitted, ['backfill_followers'])
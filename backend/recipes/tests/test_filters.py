@@ -0,0 +1,191 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.filters import RecipeFilter
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart, Tag
+from users.models import CustomUser
+
+# How each backend names an index probe on the composite unique indexes.
+INDEX_PROBES = {
+    'sqlite': {
+        'tags': '(tag_id=? AND recipe_id=?)',
+        'is_favorited': '(user_id=? AND recipe_id=?)',
+        'is_in_shopping_cart': '(user_id=? AND recipe_id=?)',
+    },
+    'postgresql': {
+        'tags': 'unique_recipe_tag',
+        'is_favorited': 'unique_favorite',
+        'is_in_shopping_cart': 'unique_recipe_cart',
+    },
+}
+
+
+class RecipeFilterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='user', email='user@example.com', password='pass'
+        )
+        cls.tags = [
+            Tag.objects.create(
+                name=f'tag {number}', color=f'#00000{number}',
+                slug=f'tag-{number}'
+            )
+            for number in range(3)
+        ]
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.user, name=f'recipe {number}', text='text',
+                cooking_time=10, image='recipes/image.png'
+            )
+            for number in range(8)
+        ]
+        # Recipe n carries tag i when bit i of n is set, so recipe 3 and
+        # recipe 7 match several tags at once.
+        for number, recipe in enumerate(cls.recipes):
+            recipe.tags.set(
+                tag for bit, tag in enumerate(cls.tags) if number >> bit & 1
+            )
+        for recipe in cls.recipes[::2]:
+            FavoriteRecipe.objects.create(user=cls.user, recipe=recipe)
+        for recipe in cls.recipes[:3]:
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def filter(self, data, user=None):
+        request = RequestFactory().get('/', data)
+        request.user = user or self.user
+        return RecipeFilter(
+            data=request.GET, queryset=Recipe.objects.all(), request=request
+        ).qs
+
+    def assert_matches(self, queryset, expected):
+        ids = list(queryset.values_list('pk', flat=True))
+        self.assertEqual(len(ids), len(set(ids)), 'duplicate recipes')
+        self.assertEqual(
+            sorted(ids), sorted(expected.values_list('pk', flat=True))
+        )
+
+    def test_tags_match_join(self):
+        for count in range(1, len(self.tags) + 1):
+            slugs = [tag.slug for tag in self.tags[:count]]
+            with self.subTest(tags=slugs):
+                self.assert_matches(
+                    self.filter({'tags': slugs}),
+                    Recipe.objects.filter(tags__slug__in=slugs).distinct(),
+                )
+
+    def test_user_flags_match_join(self):
+        self.assert_matches(
+            self.filter({'is_favorited': '1'}),
+            Recipe.objects.filter(favorite_recipes__user=self.user),
+        )
+        self.assert_matches(
+            self.filter({'is_in_shopping_cart': '1'}),
+            Recipe.objects.filter(shopping_cart__user=self.user),
+        )
+        self.assert_matches(
+            self.filter({
+                'tags': ['tag-0', 'tag-1'], 'is_favorited': '1',
+                'is_in_shopping_cart': '1',
+            }),
+            Recipe.objects.filter(
+                tags__slug__in=['tag-0', 'tag-1'],
+                favorite_recipes__user=self.user,
+                shopping_cart__user=self.user,
+            ).distinct(),
+        )
+
+    def test_anonymous_user_flags(self):
+        self.assertFalse(
+            self.filter({'is_favorited': '1'}, user=AnonymousUser())
+        )
+
+    def test_filters_probe_composite_indexes(self):
+        probes = INDEX_PROBES.get(connection.vendor)
+        if probes is None:
+            self.skipTest(f'no index names known for {connection.vendor}')
+        if connection.vendor == 'postgresql':
+            # The test tables are tiny enough for a sequential scan.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        for name, value in (
+            ('tags', ['tag-0', 'tag-1']),
+            ('is_favorited', '1'),
+            ('is_in_shopping_cart', '1'),
+        ):
+            with self.subTest(filter=name):
+                # Only the WHERE clause is planned, not the selected flags.
+                plan = self.filter({name: value}).values('pk').explain()
+                self.assertIn(probes[name], plan)
+
+
+class RecipeCursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='user', email='user@example.com', password='pass'
+        )
+        cls.other = CustomUser.objects.create_user(
+            username='other', email='other@example.com', password='pass'
+        )
+        cls.tag = Tag.objects.create(name='tag', color='#000000', slug='tag')
+        cls.recipes = []
+        for number in range(12):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'recipe {number}', text='text',
+                cooking_time=10, image='recipes/image.png'
+            )
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=timezone.now() - timedelta(minutes=number)
+            )
+            cls.recipes.append(recipe.pk)
+            if number % 3:
+                recipe.tags.set([cls.tag])
+            if number % 2:
+                FavoriteRecipe.objects.create(user=cls.user, recipe=recipe)
+            # Older recipes are favorited by more users.
+            if number > 6:
+                FavoriteRecipe.objects.create(user=cls.other, recipe=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def pages(self, **params):
+        response = self.client.get(
+            reverse('recipes-list'),
+            {'pagination': 'cursor', 'limit': 2, **params},
+        )
+        ids, pages = [], 0
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids += [recipe['id'] for recipe in data['results']]
+            pages += 1
+            if not data['next']:
+                return ids, pages
+            response = self.client.get(data['next'])
+
+    def test_filters_are_kept_across_pages(self):
+        ids, pages = self.pages(tags='tag', is_favorited=1)
+        # Recipes 1, 5, 7 and 11: favorited and tagged.
+        self.assertEqual(ids, [
+            self.recipes[number] for number in range(12)
+            if number % 3 and number % 2
+        ])
+        self.assertEqual(pages, 2)
+
+    def test_ordering_is_ignored(self):
+        for ordering in ('-favorites_count', 'favorites_count,-id'):
+            with self.subTest(ordering=ordering):
+                self.assertEqual(
+                    self.pages(ordering=ordering), (self.recipes, 6)
+                )
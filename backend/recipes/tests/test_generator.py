@@ -0,0 +1,26 @@
+from django.test import TestCase
+
+from recipes.counters import recount
+from recipes.generator import FixtureGenerator, get_writer
+from recipes.models import Ingredient, Recipe, RecipeChange
+
+
+class FixtureGeneratorTests(TestCase):
+
+    def test_generate(self):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient {number}', measurement_unit='g')
+            for number in range(50)
+        )
+        counts = FixtureGenerator(get_writer(1000), seed=1).generate(
+            users=20, recipes=100, follows=3, favorites=5, cart=2,
+            ingredients_per_recipe=4, tags=4,
+        )
+        self.assertEqual(Recipe.objects.count(), 100)
+        self.assertTrue(counts)
+        # Every generated recipe reaches running coverage indexes.
+        self.assertEqual(
+            set(RecipeChange.objects.values_list('recipe_id', flat=True)),
+            set(Recipe.objects.values_list('pk', flat=True)),
+        )
+        self.assertEqual(set(recount().values()), {0})
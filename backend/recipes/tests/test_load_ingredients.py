@@ -0,0 +1,131 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from recipes.models import Ingredient, IngredientsRecipe, Recipe
+from users.models import CustomUser
+
+COMMAND = 'recipes.management.commands.load_ingredients'
+INGREDIENTS = [
+    {'name': 'Salt', 'measurement_unit': 'g'},
+    {'name': 'Milk, whole', 'measurement_unit': 'ml'},
+    {'name': 'Crème fraîche', 'measurement_unit': 'g'},
+    # Same ingredients spelled differently.
+    {'name': ' salt ', 'measurement_unit': 'G'},
+    {'name': 'STRASSE', 'measurement_unit': 'pc'},
+    {'name': 'Straße', 'measurement_unit': 'pc'},
+]
+LOADED = {
+    ('Salt', 'g'), ('Milk, whole', 'ml'), ('Crème fraîche', 'g'),
+    ('STRASSE', 'pc'),
+}
+
+
+class LoadIngredientsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Drop the catalogue loaded by the data migration.
+        Ingredient.objects.all().delete()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, file_name, ingredients=INGREDIENTS):
+        path = os.path.join(self.directory, file_name)
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            if file_name.endswith('.json'):
+                json.dump(ingredients, file, ensure_ascii=False, indent=2)
+            elif file_name.endswith('.csv'):
+                file.write('name,measurement_unit\r\n')
+                for item in ingredients:
+                    file.write(
+                        f'"{item["name"]}",{item["measurement_unit"]}\r\n'
+                    )
+            else:
+                for item in ingredients:
+                    file.write(json.dumps(item, ensure_ascii=False) + '\n\n')
+        return path
+
+    def load(self, path, *args):
+        out = StringIO()
+        call_command('load_ingredients', path, *args, stdout=out)
+        return out.getvalue()
+
+    def loaded(self):
+        return set(Ingredient.objects.values_list('name', 'measurement_unit'))
+
+    def test_formats(self):
+        for file_name in ('a.json', 'a.csv', 'a.ndjson', 'a.jsonl'):
+            with self.subTest(file_name=file_name):
+                Ingredient.objects.all().delete()
+                output = self.load(self.write(file_name))
+                self.assertIn('Inserted: 4, updated: 0, skipped: 2', output)
+                self.assertEqual(self.loaded(), LOADED)
+
+    def test_json_is_streamed_across_chunks(self):
+        with mock.patch(f'{COMMAND}.CHUNK_SIZE', 7):
+            self.load(self.write('a.json'))
+        self.assertEqual(self.loaded(), LOADED)
+
+    def test_second_run_is_idempotent(self):
+        path = self.write('a.json')
+        self.load(path)
+        output = self.load(path)
+        self.assertIn('Inserted: 0, updated: 0, skipped: 6', output)
+        self.assertEqual(Ingredient.objects.count(), 4)
+
+    def test_rename_refreshes_recipes(self):
+        salt = Ingredient.objects.create(name='salt', measurement_unit='G')
+        author = CustomUser.objects.create_user(
+            username='cook', email='cook@example.com', password='pass'
+        )
+        recipe = Recipe.objects.create(
+            author=author, name='recipe', text='text', cooking_time=10,
+            image='recipes/image.png',
+        )
+        IngredientsRecipe.objects.create(recipe=recipe, ingredient=salt)
+        with mock.patch(f'{COMMAND}.schedule_search_refresh') as refresh:
+            output = self.load(self.write('a.json'))
+        self.assertIn('Inserted: 3, updated: 1, skipped: 2', output)
+        refresh.assert_called_once_with({recipe.pk})
+        salt.refresh_from_db()
+        self.assertEqual((salt.name, salt.measurement_unit), ('Salt', 'g'))
+
+    def test_verify(self):
+        path = self.write('a.csv')
+        self.load(path)
+        self.assertIn('The database matches the file', self.load(
+            path, '--verify'
+        ))
+        Ingredient.objects.create(name='salt', measurement_unit='g')
+        Ingredient.objects.filter(name='STRASSE').delete()
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('load_ingredients', path, '--verify', stdout=out)
+        self.assertIn('Missing from the database: 1', out.getvalue())
+        self.assertIn('Duplicated in the database: 1', out.getvalue())
+        self.assertEqual(len(self.loaded()), 4)
+
+    def test_invalid_files(self):
+        for file_name, content in (
+            ('a.json', '{"name": "Salt"}'),
+            ('b.json', '[{"name": "Salt", "measurement_unit": "g"}'),
+            ('c.json', '[{"name": "Salt"}]'),
+            ('d.ndjson', '{"name": "", "measurement_unit": "g"}'),
+            ('e.txt', ''),
+        ):
+            path = os.path.join(self.directory, file_name)
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(content)
+            with self.subTest(file_name=file_name):
+                with self.assertRaises(CommandError):
+                    self.load(path)
+        self.assertFalse(Ingredient.objects.exists())
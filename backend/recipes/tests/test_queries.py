@@ -0,0 +1,180 @@
+import base64
+import io
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientsRecipe,
+                            Recipe, ShoppingCart, Tag, TagsRecipe)
+from users.models import CustomUser
+
+# Query budgets per action; they must not depend on how many recipes,
+# tags or ingredients are involved.
+LIST_QUERIES = 4  # count, page, tags, ingredients
+RETRIEVE_QUERIES = 3  # recipe, tags, ingredients
+CREATE_QUERIES = 14
+UPDATE_QUERIES = 17
+
+
+def png_data_uri():
+    output = io.BytesIO()
+    Image.new('RGB', (2, 2), 'red').save(output, format='PNG')
+    return (
+        'data:image/png;base64,'
+        + base64.b64encode(output.getvalue()).decode()
+    )
+
+
+# Anonymous responses are cached; the budgets are for the views themselves.
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class RecipeQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='pass'
+        )
+        cls.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='pass'
+        )
+        cls.tags = [
+            Tag.objects.create(
+                name=f'tag {number}', color=f'#00000{number}',
+                slug=f'tag-{number}'
+            )
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient {number}', measurement_unit='g'
+            )
+            for number in range(6)
+        ]
+
+    def setUp(self):
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def create_recipes(self, count):
+        recipes = []
+        for number in range(Recipe.objects.count(), count):
+            recipe = Recipe.objects.create(
+                author=self.author, name=f'recipe {number}',
+                text='text', cooking_time=10, image='recipes/image.png'
+            )
+            TagsRecipe.objects.bulk_create(
+                TagsRecipe(recipe=recipe, tag=tag) for tag in self.tags
+            )
+            IngredientsRecipe.objects.bulk_create(
+                IngredientsRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+                for ingredient in self.ingredients
+            )
+            FavoriteRecipe.objects.create(user=self.reader, recipe=recipe)
+            ShoppingCart.objects.create(user=self.reader, recipe=recipe)
+            recipes.append(recipe)
+        return recipes
+
+    def recipe_payload(self, tags, ingredients, name='new recipe'):
+        return {
+            'name': name,
+            'text': 'text',
+            'cooking_time': 5,
+            'image': png_data_uri(),
+            'tags': [tag.pk for tag in tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': 2}
+                for ingredient in ingredients
+            ],
+        }
+
+    def assert_get_queries(self, client, url, queries):
+        with self.assertNumQueries(queries):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_list(self):
+        url = reverse('recipes-list')
+        for count in (1, 20):
+            self.create_recipes(count)
+            for client in (self.anonymous, self.client):
+                with self.subTest(recipes=count, client=client):
+                    data = self.assert_get_queries(client, url, LIST_QUERIES)
+                    self.assertEqual(data['count'], count)
+                    self.assertEqual(
+                        len(data['results'][0]['ingredients']),
+                        len(self.ingredients)
+                    )
+
+    def test_list_flags(self):
+        self.create_recipes(2)
+        data = self.assert_get_queries(
+            self.client, reverse('recipes-list'), LIST_QUERIES
+        )
+        for recipe in data['results']:
+            self.assertIs(recipe['is_favorited'], True)
+            self.assertIs(recipe['is_in_shopping_cart'], True)
+
+    def test_retrieve(self):
+        for count in (1, 20):
+            recipe = self.create_recipes(count)[-1]
+            url = reverse('recipes-detail', kwargs={'pk': recipe.pk})
+            for client in (self.anonymous, self.client):
+                with self.subTest(recipes=count, client=client):
+                    data = self.assert_get_queries(
+                        client, url, RETRIEVE_QUERIES
+                    )
+                    self.assertEqual(len(data['tags']), len(self.tags))
+
+    def test_create(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        for size in (1, len(self.ingredients)):
+            with self.subTest(size=size):
+                payload = self.recipe_payload(
+                    self.tags[:min(size, len(self.tags))],
+                    self.ingredients[:size], name=f'created {size}'
+                )
+                with self.assertNumQueries(CREATE_QUERIES):
+                    response = client.post(
+                        reverse('recipes-list'), payload, format='json'
+                    )
+                self.assertEqual(response.status_code, 201, response.data)
+                self.assertEqual(len(response.data['ingredients']), size)
+
+    def test_update(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        # Every update drops one ingredient, adds another and changes the
+        # amount of the rest.
+        for size in (2, len(self.ingredients) - 1):
+            with self.subTest(size=size):
+                recipe = Recipe.objects.create(
+                    author=self.author, name=f'updated {size}', text='text',
+                    cooking_time=10, image='recipes/image.png'
+                )
+                IngredientsRecipe.objects.bulk_create(
+                    IngredientsRecipe(
+                        recipe=recipe, ingredient=ingredient, amount=1
+                    )
+                    for ingredient in self.ingredients[:size]
+                )
+                payload = self.recipe_payload(
+                    [], self.ingredients[1:size + 1], name=recipe.name
+                )
+                del payload['tags']
+                with self.assertNumQueries(UPDATE_QUERIES):
+                    response = client.patch(
+                        reverse('recipes-detail', kwargs={'pk': recipe.pk}),
+                        payload, format='json'
+                    )
+                self.assertEqual(response.status_code, 200, response.data)
+                self.assertEqual(
+                    [item['amount'] for item in response.data['ingredients']],
+                    [2] * size
+                )
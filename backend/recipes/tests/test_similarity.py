@@ -0,0 +1,105 @@
+import numpy as np
+from django.test import TestCase
+
+from recipes.models import (FavoriteRecipe, RemovedInteraction, Recipe,
+                            ShoppingCart, SimilarRecipe)
+from recipes.similarity import (CART_WEIGHT, FAVORITE_WEIGHT,
+                                compute_similar_recipes)
+from users.models import CustomUser
+
+TOP_N = 10
+# (user, recipe) positions in the tiny matrix below.
+FAVORITES = [(0, 0), (0, 1), (1, 1), (1, 2), (2, 0), (2, 2), (2, 3),
+             (3, 4), (3, 5)]
+CART = [(0, 2), (1, 1), (3, 0), (4, 5)]
+
+
+def brute_force(favorites, cart, recipe_ids):
+    """{recipe id: {similar id: cosine}} from a dense matrix."""
+    matrix = np.zeros((5, len(recipe_ids)))
+    for pairs, weight in ((favorites, FAVORITE_WEIGHT), (cart, CART_WEIGHT)):
+        for user, recipe in pairs:
+            matrix[user, recipe] += weight
+    norms = np.linalg.norm(matrix, axis=0)
+    norms[norms == 0] = 1
+    cosine = (matrix / norms).T @ (matrix / norms)
+    return {
+        recipe_ids[recipe]: {
+            recipe_ids[similar]: cosine[recipe, similar]
+            for similar in range(len(recipe_ids))
+            if similar != recipe and cosine[recipe, similar] > 0
+        }
+        for recipe in range(len(recipe_ids))
+        if cosine[recipe].any()
+    }
+
+
+class SimilarRecipesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            CustomUser.objects.create_user(
+                username=f'user{number}', email=f'user{number}@example.com',
+                password='pass'
+            )
+            for number in range(5)
+        ]
+        cls.recipe_ids = [
+            Recipe.objects.create(
+                author=cls.users[0], name=f'recipe {number}', text='text',
+                cooking_time=10, image='recipes/image.png',
+            ).pk
+            for number in range(6)
+        ]
+        for model, pairs in ((FavoriteRecipe, FAVORITES),
+                             (ShoppingCart, CART)):
+            model.objects.bulk_create(
+                model(user=cls.users[user], recipe_id=cls.recipe_ids[recipe])
+                for user, recipe in pairs
+            )
+
+    def stored(self):
+        neighbours = {}
+        for recipe_id, similar_id, score in SimilarRecipe.objects.values_list(
+            'recipe_id', 'similar_id', 'score'
+        ):
+            neighbours.setdefault(recipe_id, {})[similar_id] = score
+        return neighbours
+
+    def assertMatches(self, favorites, cart):
+        expected = brute_force(favorites, cart, self.recipe_ids)
+        stored = self.stored()
+        self.assertEqual(stored.keys(), expected.keys())
+        for recipe_id, similar in expected.items():
+            self.assertEqual(stored[recipe_id].keys(), similar.keys())
+            for similar_id, score in similar.items():
+                self.assertAlmostEqual(stored[recipe_id][similar_id], score)
+
+    def remove(self, model, user, recipe):
+        model.objects.filter(
+            user=self.users[user], recipe_id=self.recipe_ids[recipe]
+        ).delete()
+
+    def test_full_run_matches_brute_force(self):
+        compute_similar_recipes(TOP_N, 1000, full=True)
+        self.assertMatches(FAVORITES, CART)
+
+    def test_incremental_run_applies_removals(self):
+        compute_similar_recipes(TOP_N, 1000, full=True)
+        # User 0 was the only link between recipes 0 and 1; recipe 4
+        # loses its only interaction.
+        self.remove(FavoriteRecipe, 0, 1)
+        self.remove(FavoriteRecipe, 3, 4)
+        self.assertEqual(RemovedInteraction.objects.count(), 2)
+        compute_similar_recipes(TOP_N, 1000)
+        favorites = [
+            pair for pair in FAVORITES if pair not in ((0, 1), (3, 4))
+        ]
+        self.assertMatches(favorites, CART)
+        self.assertNotIn(self.recipe_ids[1], self.stored()[self.recipe_ids[0]])
+        self.assertNotIn(self.recipe_ids[4], self.stored())
+        self.assertEqual(RemovedInteraction.objects.count(), 2)
+        # The next run drops the log entries the previous one applied.
+        compute_similar_recipes(TOP_N, 1000)
+        self.assertEqual(RemovedInteraction.objects.count(), 0)
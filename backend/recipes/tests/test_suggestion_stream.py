@@ -0,0 +1,112 @@
+import json
+import re
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from recipes.suggestions import FakeProvider, SuggestionService
+
+
+class BrokenStreamProvider(FakeProvider):
+
+    def stream(self, prompt, timeout):
+        yield 'Fake '
+        raise RuntimeError('connection reset')
+
+
+def parse_events(body):
+    """Return (event, data) pairs; comments are skipped."""
+    events = []
+    for block in body.decode().split('\n\n'):
+        event, data = 'message', None
+        for line in block.splitlines():
+            if line.startswith('event: '):
+                event = line[len('event: '):]
+            elif line.startswith('data: '):
+                data = json.loads(line[len('data: '):])
+        if data is not None:
+            events.append((event, data))
+    return events
+
+
+@override_settings(AI_SUGGESTION_TIMEOUT=5)
+class SuggestionStreamTests(TestCase):
+    url = reverse('recipes-ai-suggest-recipe')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def use_provider(self, provider):
+        service = SuggestionService(provider)
+        self.addCleanup(service.executor.shutdown)
+        patcher = mock.patch(
+            'recipes.views.get_suggestion_service', return_value=service
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return service
+
+    def post(self, **extra):
+        return self.client.post(
+            self.url, {'ingredients': 'eggs, milk'}, format='json', **extra
+        )
+
+    def stream(self):
+        return self.post(HTTP_ACCEPT='text/event-stream')
+
+    def test_tokens_in_order(self):
+        provider = FakeProvider()
+        service = self.use_provider(provider)
+        response = self.stream()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response['Content-Type'].startswith('text/event-stream')
+        )
+        events = parse_events(b''.join(response.streaming_content))
+        text = provider.get_text(service.get_prompt(('eggs', 'milk')))
+        self.assertEqual(
+            [data['delta'] for event, data in events[:-1]],
+            re.findall(r'\S+\s*', text),
+        )
+        self.assertEqual(events[-1], ('done', {'cached': False}))
+
+    def test_provider_failure(self):
+        self.use_provider(BrokenStreamProvider())
+        events = parse_events(b''.join(self.stream().streaming_content))
+        self.assertEqual(events[0], ('message', {'delta': 'Fake '}))
+        self.assertEqual(events[-1][0], 'error')
+        self.assertEqual(
+            events[-1][1], {'error': 'Error interacting with OpenAI API'}
+        )
+
+    def test_closing_the_response_cancels_the_provider(self):
+        provider = FakeProvider()
+        service = self.use_provider(provider)
+        response = self.stream()
+        chunks = iter(response.streaming_content)
+        next(chunks)  # stream opened comment
+        next(chunks)
+        next(chunks)
+        response.close()
+        self.assertEqual(provider.streamed_chunks, 2)
+        with self.assertRaises(StopIteration):
+            next(chunks)
+        # A cancelled suggestion is not cached.
+        self.assertIsNone(service.cache.get(('eggs', 'milk')))
+
+    def test_json_response(self):
+        self.use_provider(FakeProvider())
+        for cached in (False, True):
+            response = self.post()
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertEqual(response.data['success'], True)
+            self.assertEqual(response.data['cached'], cached)
+            self.assertIn('Fake recipe', response.data['suggestion'])
+
+    def test_missing_ingredients(self):
+        self.use_provider(FakeProvider())
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,106 @@
+import threading
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from recipes.suggestions import (FakeProvider, SuggestionCache,
+                                 SuggestionError, SuggestionService,
+                                 SuggestionTimeout, normalize_ingredients)
+
+
+class SlowProvider(FakeProvider):
+    delay = 0.2
+
+
+class FailingProvider(FakeProvider):
+
+    def suggest(self, prompt, timeout):
+        super().suggest(prompt, timeout)
+        raise SuggestionError('provider failed')
+
+
+@override_settings(
+    AI_SUGGESTION_TIMEOUT=2, AI_SUGGESTION_CACHE_SIZE=8,
+    AI_SUGGESTION_CACHE_TTL=60, AI_SUGGESTION_WORKERS=4,
+)
+class SuggestionServiceTests(SimpleTestCase):
+
+    def service(self, provider):
+        service = SuggestionService(provider)
+        self.addCleanup(service.executor.shutdown)
+        return service
+
+    def test_concurrent_misses_make_one_call(self):
+        provider = SlowProvider()
+        service = self.service(provider)
+        spellings = ['Eggs, milk', 'milk,eggs', ['MILK', ' eggs '], 'eggs,milk']
+        results = []
+        barrier = threading.Barrier(len(spellings) * 2)
+
+        def request(spelling):
+            barrier.wait()
+            results.append(service.suggest(normalize_ingredients(spelling)))
+
+        threads = [
+            threading.Thread(target=request, args=(spelling,))
+            for spelling in spellings * 2
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(provider.calls, 1)
+        self.assertEqual(len({suggestion for suggestion, _ in results}), 1)
+        self.assertEqual(service.suggest(('eggs', 'milk'))[1], True)
+        self.assertEqual(service.in_flight, {})
+
+    def test_timeout(self):
+        provider = SlowProvider()
+        service = self.service(provider)
+        service.timeout = 0.05
+        with self.assertRaises(SuggestionTimeout):
+            service.suggest(('eggs',))
+        # The call outlives the timeout and still fills the cache.
+        service.executor.shutdown(wait=True)
+        self.assertEqual(service.suggest(('eggs',))[1], True)
+        self.assertEqual(provider.calls, 1)
+
+    def test_failed_call_is_removed_from_in_flight(self):
+        provider = FailingProvider()
+        service = self.service(provider)
+        for calls in (1, 2):
+            with self.assertRaises(SuggestionError):
+                service.suggest(('eggs',))
+            self.assertEqual(service.in_flight, {})
+            self.assertEqual(provider.calls, calls)
+
+    @override_settings(AI_SUGGESTION_CACHE_TTL=0.05)
+    def test_expired_entries_are_fetched_again(self):
+        provider = FakeProvider()
+        service = self.service(provider)
+        self.assertEqual(service.suggest(('eggs',))[1], False)
+        self.assertEqual(service.suggest(('eggs',))[1], True)
+        time.sleep(0.1)
+        self.assertEqual(service.suggest(('eggs',))[1], False)
+        self.assertEqual(provider.calls, 2)
+
+
+class SuggestionCacheTests(SimpleTestCase):
+
+    def test_least_recently_used_is_evicted(self):
+        cache = SuggestionCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_expiry(self):
+        cache = SuggestionCache(max_size=2, ttl=0.05)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.entries, {})
@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from recipes.views import IngredientsViewSet, RecipeViewSet, TagsViewSet
+from recipes.views import (IngredientsViewSet, RecipeViewSet, StatsView,
+                           TagsViewSet)
 
 
 router_v1 = DefaultRouter()
@@ -11,5 +12,6 @@ router_v1.register('tags', TagsViewSet, basename='tags')
 
 
 urlpatterns = [
+    path('stats/', StatsView.as_view(), name='stats'),
     path('', include(router_v1.urls)),
 ]
\ No newline at end of file
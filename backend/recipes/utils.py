@@ -1,32 +1,160 @@
-from django.http import HttpResponse
-
-from .models import ShoppingCart
-
-
-def get_shopping_list(request):
-    shopping_cart = ShoppingCart.objects.filter(user=request.user).all()
-    shopping_list = {}
-    for item in shopping_cart:
-        for recipe_ingredient in item.recipe.recipe_ingredients.all():
-            name = recipe_ingredient.ingredient.name
-            measuring_unit = recipe_ingredient.ingredient.measurement_unit
-            amount = recipe_ingredient.amount
-            if name not in shopping_list:
-                shopping_list[name] = {
-                    'name': name,
-                    'measurement_unit': measuring_unit,
-                    'amount': amount
-                }
-            else:
-                shopping_list[name]['amount'] += amount
-    content = (
-        [f'{item["name"]} ({item["measurement_unit"]}) '
-        f'- {item["amount"]}\n'
-        for item in shopping_list.values()]
+import csv
+
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+
+from .models import IngredientsRecipe
+
+SHOPPING_LIST_FILENAME = 'shopping_list'
+SHOPPING_LIST_HEADER = ('name', 'measurement_unit', 'amount')
+
+PDF_PAGE_WIDTH = 595
+PDF_PAGE_HEIGHT = 842
+PDF_MARGIN = 40
+PDF_FONT_SIZE = 10
+PDF_LEADING = 13
+PDF_LINES_PER_PAGE = (PDF_PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LEADING
+
+
+def get_shopping_list_items(user):
+    """Sum ingredient amounts over the user's shopping cart in one query."""
+    return (
+        IngredientsRecipe.objects
+        .filter(recipe__shopping_cart__user=user)
+        .values('ingredient__name', 'ingredient__measurement_unit')
+        .annotate(amount=Sum('amount'))
+        .order_by('ingredient__name', 'ingredient__measurement_unit')
+    )
+
+
+def format_item(item):
+    return (
+        f'{item["ingredient__name"]} '
+        f'({item["ingredient__measurement_unit"]}) - {item["amount"]}'
+    )
+
+
+def iter_txt(items):
+    for item in items:
+        yield f'{format_item(item)}\n'
+
+
+class EchoBuffer:
+    """File-like object handing csv.writer rows straight back."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(items):
+    writer = csv.writer(EchoBuffer())
+    yield writer.writerow(SHOPPING_LIST_HEADER)
+    for item in items:
+        yield writer.writerow((
+            item['ingredient__name'],
+            item['ingredient__measurement_unit'],
+            item['amount'],
+        ))
+
+
+def pdf_escape(text):
+    text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return text.encode('cp1252', 'replace')
+
+
+def pdf_page_stream(lines):
+    top = PDF_PAGE_HEIGHT - PDF_MARGIN - PDF_FONT_SIZE
+    parts = [
+        b'BT /F1 %d Tf %d TL %d %d Td' % (
+            PDF_FONT_SIZE, PDF_LEADING, PDF_MARGIN, top
+        )
+    ]
+    for line in lines:
+        parts.append(b'(' + pdf_escape(line) + b') Tj T*')
+    parts.append(b'ET')
+    return b'\n'.join(parts)
+
+
+def iter_pdf(items):
+    """
+    Write a minimal multi-page PDF while reading the items.
+
+    Only one page of lines is held in memory at a time; the page tree
+    (object 2) is written last, once the number of pages is known.
+    """
+    offsets = {}
+    position = 0
+    next_object = 4
+    kids = []
+
+    def write_object(number, body):
+        nonlocal position
+        offsets[number] = position
+        chunk = b'%d 0 obj\n' % number + body + b'\nendobj\n'
+        position += len(chunk)
+        return chunk
+
+    def write_page(lines):
+        nonlocal next_object
+        stream = pdf_page_stream(lines)
+        content, page = next_object, next_object + 1
+        next_object += 2
+        kids.append(page)
+        return write_object(
+            content,
+            b'<< /Length %d >>\nstream\n' % len(stream)
+            + stream + b'\nendstream'
+        ) + write_object(
+            page,
+            b'<< /Type /Page /Parent 2 0 R /Resources << /Font '
+            b'<< /F1 3 0 R >> >> /MediaBox [0 0 %d %d] /Contents %d 0 R >>'
+            % (PDF_PAGE_WIDTH, PDF_PAGE_HEIGHT, content)
+        )
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position = len(header)
+    yield header
+    yield write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+    yield write_object(
+        3,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+        b'/Encoding /WinAnsiEncoding >>'
+    )
+    lines = []
+    for item in items:
+        lines.append(format_item(item))
+        if len(lines) == PDF_LINES_PER_PAGE:
+            yield write_page(lines)
+            lines = []
+    if lines or not kids:
+        yield write_page(lines)
+    yield write_object(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % kid for kid in kids), len(kids)
+    ))
+    xref = [b'xref\n0 %d\n' % next_object, b'0000000000 65535 f \n']
+    for number in range(1, next_object):
+        xref.append(b'%010d 00000 n \n' % offsets[number])
+    xref.append(
+        b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+        % (next_object, position)
     )
-    filename = 'shopping_list.txt'
-    response = HttpResponse(content, content_type='text/plain')
+    yield b''.join(xref)
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (iter_txt, 'text/plain'),
+    'csv': (iter_csv, 'text/csv'),
+    'pdf': (iter_pdf, 'application/pdf'),
+}
+
+
+def get_shopping_list(user, file_format='txt'):
+    writer, content_type = SHOPPING_LIST_FORMATS[file_format]
+    items = get_shopping_list_items(user).iterator()
+    response = StreamingHttpResponse(writer(items), content_type=content_type)
     response['Content-Disposition'] = (
-        'attachment; filename={0}'.format(filename)
+        'attachment; filename={0}.{1}'.format(
+            SHOPPING_LIST_FILENAME, file_format
+        )
     )
-    return response
\ No newline at end of file
+    return response
@@ -1,33 +1,97 @@
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (
-    IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
+    IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
 )
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
-from foodgram import settings
-from .filters import RecipeFilter
-from .models import FavoriteRecipe, Ingredient, Recipe, ShoppingCart, Tag
+from .cache import CachedResponseMixin, response_cache_stats
+from .checkout import enqueue_checkout, get_checkout_items
+from .coverage_index import coverage_index
+from .external_api import get_grocery_service
+from .feed import read_feed
+from .filters import RecipeFilter, RecipeSearchFilter
+from .ingredient_index import ingredient_index
+from .models import (CheckoutJob, FavoriteRecipe, Ingredient, Recipe,
+                     ShoppingCart, SimilarRecipe, Tag)
+from .pagination import FeedPagination, RecipeCursorPagination
 from .permissions import AuthorOrReadOnly
-from .serializers import (FavoritedSerializer, IngredientSerializer,
+from .renderers import EventStreamRenderer
+from .serializers import (CheckoutJobSerializer, CookableRecipeSerializer,
+                          FavoritedSerializer, IngredientSerializer,
                           RecipeSerializer, ShoppingCartSerializer,
-                          TagSerializer)
-from .utils import get_shopping_list
-from .external_api import ExternalGroceryService
-import openai
-from rest_framework.decorators import api_view
+                          SimilarRecipeSerializer, TagSerializer)
+from .suggestions import (SuggestionError, SuggestionTimeout,
+                          get_suggestion_service, iter_suggestion_events,
+                          normalize_ingredients)
+from .utils import SHOPPING_LIST_FORMATS, get_shopping_list
 
+COOKABLE_LIMIT = 20
+COOKABLE_MAX_LIMIT = 100
+SIMILAR_LIMIT = 10
+SIMILAR_MAX_LIMIT = 50
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    # Author names embedded in recipes may lag a profile edit by up to
+    # RESPONSE_CACHE_TIMEOUT; bumping on every user save would flush all
+    # pages on each signup.
+    cache_resources = ('recipes', 'tags', 'ingredients')
     queryset = Recipe.objects.all()
-    filter_backends = [DjangoFilterBackend]
+    # Search runs last so that its relevance ordering can replace the
+    # default one.
+    filter_backends = [
+        DjangoFilterBackend, filters.OrderingFilter, RecipeSearchFilter
+    ]
     filter_class = RecipeFilter
+    ordering_fields = ('pub_date', 'favorites_count', 'in_carts_count')
+    ordering = RecipeCursorPagination.ordering
+    # Counters change on every favorite without bumping a generation, so
+    # pages ordered by them are never cached.
+    uncached_orderings = ('favorites_count', 'in_carts_count')
+
+    @property
+    def pagination_class(self):
+        # ?pagination=cursor opts in; next/previous links keep the flag.
+        if self.request.query_params.get('pagination') == 'cursor':
+            return RecipeCursorPagination
+        return api_settings.DEFAULT_PAGINATION_CLASS
     serializer_class = RecipeSerializer
     permission_classes = [AuthorOrReadOnly]
 
+    def is_cacheable(self, request):
+        ordering = request.query_params.get(api_settings.ORDERING_PARAM, '')
+        return not any(
+            field.strip().lstrip('-') in self.uncached_orderings
+            for field in ordering.split(',')
+        )
+
+    def get_queryset(self):
+        queryset = Recipe.objects.with_user_flags(
+            self.request.user
+        ).defer('search_vector')
+        if self.action in ('list', 'retrieve'):
+            return queryset.with_related()
+        return queryset
+
+    def reload_for_representation(self, serializer):
+        serializer.instance = self.get_queryset().with_related().get(
+            pk=serializer.instance.pk
+        )
+
+    def perform_create(self, serializer):
+        serializer.save()
+        self.reload_for_representation(serializer)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        self.reload_for_representation(serializer)
+
     @action(
         detail=True,
         methods=['POST', 'DELETE'],
@@ -64,13 +128,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
         recipe = get_object_or_404(Recipe, pk=pk)
         user = request.user
         if request.method == 'POST':
-            recipe, created = ShoppingCart.objects.get_or_create(
+            cart_item, created = ShoppingCart.objects.get_or_create(
                 user=user, recipe=recipe
             )
             if created is True:
                 serializer = ShoppingCartSerializer()
                 return Response(
-                    serializer.to_representation(instance=recipe),
+                    serializer.to_representation(instance=cart_item),
                     status=status.HTTP_201_CREATED
                 )
             return Response(
@@ -91,8 +155,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAuthenticated]
     )
     def download_shopping_cart(self, request):
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {'errors': 'Supported formats: {0}'.format(
+                    ', '.join(SHOPPING_LIST_FORMATS)
+                )},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         try:
-            return get_shopping_list(request)
+            return get_shopping_list(request.user, file_format)
         except:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
@@ -103,66 +175,161 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAuthenticated]
     )
     def checkout(self, request):
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"Checkout request received: {request.data}")
-        shopping_cart_items = ShoppingCart.objects.filter(user=request.user)
-        if not shopping_cart_items.exists():
+        items = get_checkout_items(request.user)
+        if not items:
             return Response({"error": "Shopping cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
+        job = enqueue_checkout(
+            request.user, items, request.META.get('HTTP_IDEMPOTENCY_KEY')
+        )
+        serializer = CheckoutJobSerializer(job)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        url_path=(
+            r'checkout/(?P<job_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}'
+            r'-[0-9a-f]{4}-[0-9a-f]{12})'
+        ),
+        permission_classes=[IsAuthenticated]
+    )
+    def checkout_status(self, request, job_id):
+        job = get_object_or_404(CheckoutJob, pk=job_id, user=request.user)
+        serializer = CheckoutJobSerializer(job)
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        """Recipes of the followed authors, newest first."""
+        paginator = FeedPagination()
+        size = paginator.get_page_size(request)
+        rows = read_feed(
+            request.user, paginator.decode_cursor(request), size + 1
+        )
+        page = rows[:size]
+        recipes = self.get_queryset().with_related().in_bulk(
+            [recipe_id for _, recipe_id in page]
+        )
+        serializer = self.get_serializer(
+            [recipes[recipe_id] for _, recipe_id in page
+             if recipe_id in recipes],
+            many=True,
+        )
+        return paginator.get_paginated_response(
+            request, serializer.data, page[-1] if len(rows) > size else None
+        )
+
+    @action(
+        detail=True,
+        methods=['GET'],
+        permission_classes=[AllowAny]
+    )
+    def similar(self, request, pk):
+        try:
+            limit = min(int(request.query_params.get('limit', SIMILAR_LIMIT)),
+                        SIMILAR_MAX_LIMIT)
+        except ValueError:
+            return Response(
+                {'errors': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        similar = SimilarRecipe.objects.filter(
+            recipe_id=pk
+        ).select_related('similar').only(
+            'score', 'similar__id', 'similar__name', 'similar__image',
+            'similar__has_image_variants', 'similar__cooking_time',
+        ).order_by('-score')[:max(limit, 0)]
+        return Response(SimilarRecipeSerializer(similar, many=True).data)
 
-        ingredients = {}
-        for item in shopping_cart_items:
-            recipe_ingredients = item.recipe.recipe_ingredients.all()
-            for ingredient in recipe_ingredients:
-                name = ingredient.ingredient.name
-                unit = ingredient.ingredient.measurement_unit
-                amount = ingredient.amount
-                if name in ingredients:
-                    ingredients[name]['quantity'] += amount
-                else:
-                    ingredients[name] = {
-                        'name': name,
-                        'quantity': amount,
-                        'unit': unit,
-                    }
-
-        items = list(ingredients.values())
-
-        grocery_service = ExternalGroceryService()
-        response = grocery_service.create_shopping_list(items)
-
-        if "error" in response:
-            return Response(response, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        return Response(response, status=status.HTTP_200_OK)
+    @action(
+        detail=False,
+        methods=['GET'],
+        url_path='what-can-i-cook',
+        permission_classes=[AllowAny]
+    )
+    def what_can_i_cook(self, request):
+        """Rank recipes by how much of them the given ingredients cover."""
+        params = request.query_params
+        try:
+            ingredient_ids = [
+                int(value) for value in params.get('ingredients', '').split(',')
+                if value.strip()
+            ]
+            limit = int(params.get('limit', COOKABLE_LIMIT))
+            max_missing = params.get('max_missing')
+            max_missing = None if max_missing is None else int(max_missing)
+        except ValueError:
+            return Response(
+                {'errors': 'ingredients, limit and max_missing must be '
+                           'integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not ingredient_ids:
+            return Response(
+                {'errors': 'Pass ingredient ids as ?ingredients=1,2,3'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ranked = coverage_index.rank(
+            ingredient_ids, min(max(limit, 0), COOKABLE_MAX_LIMIT),
+            max_missing,
+        )
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'has_image_variants', 'cooking_time'
+        ).in_bulk([recipe_id for recipe_id, *_ in ranked])
+        results = []
+        for recipe_id, covered, missing, missing_ingredients in ranked:
+            # Deleted after the index was last refreshed.
+            if recipe_id not in recipes:
+                continue
+            recipe = recipes[recipe_id]
+            recipe.covered = covered
+            recipe.missing = missing
+            recipe.missing_ingredients = missing_ingredients
+            results.append(recipe)
+        return Response(CookableRecipeSerializer(results, many=True).data)
 
     @action(
     detail=False,
     methods=['POST'],
     permission_classes=[AllowAny],
-    url_path='ai-suggestion'
+    url_path='ai-suggestion',
+    renderer_classes=[
+        *api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer
+    ],
     )
     def ai_suggest_recipe(self, request):
-        ingredients = request.data.get('ingredients', '')
+        ingredients = normalize_ingredients(request.data.get('ingredients', ''))
         if not ingredients:
             return Response({"error": "Ingredients list is required"}, status=400)
 
-        prompt = settings.AI_SUGGESTION_PROMPT_TEMPLATE.format(ingredients=ingredients)
-        try:
-            openai.api_key = settings.OPENAI_API_KEY
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=200,
+        if request.accepted_renderer.format == EventStreamRenderer.format:
+            # The WSGI server closes the generator when the client goes
+            # away, which in turn closes the provider stream.
+            response = StreamingHttpResponse(
+                iter_suggestion_events(get_suggestion_service(), ingredients),
+                content_type=EventStreamRenderer.media_type,
             )
-        except Exception:
-            return Response({"error": "Error interacting with OpenAI API"}, status=500)
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+
         try:
-            suggestion = response["choices"][0]["message"]["content"]
-            return Response({"success": True, "suggestion": suggestion})
-        except KeyError:
-            return Response({"error": "Unexpected response format from OpenAI"}, status=500)
+            suggestion, cached = get_suggestion_service().suggest(ingredients)
+        except SuggestionTimeout as error:
+            return Response({"error": str(error)}, status=504)
+        except SuggestionError as error:
+            return Response({"error": str(error)}, status=500)
+        return Response(
+            {"success": True, "suggestion": suggestion, "cached": cached}
+        )
 
-class IngredientsViewSet(viewsets.ModelViewSet):
+
+class IngredientsViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    cache_resources = ('ingredients',)
     pagination_class = None
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -170,9 +337,35 @@ class IngredientsViewSet(viewsets.ModelViewSet):
     filter_backends = (filters.SearchFilter,)
     search_fields = ('^name',)
 
+    def list(self, request, *args, **kwargs):
+        prefix = request.query_params.get(api_settings.SEARCH_PARAM, '')
+        version, ingredients = ingredient_index.search(prefix)
+        etag = ingredient_index.etag(version, prefix)
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(ingredients)
+        response['ETag'] = etag
+        return response
+
 
-class TagsViewSet(viewsets.ModelViewSet):
+class TagsViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    cache_resources = ('tags',)
     pagination_class = None
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+
+
+class StatsView(APIView):
+    """
+    Operational counters for staff. They are kept per process, so each
+    worker reports its own share of the traffic.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'response_cache': response_cache_stats.snapshot(),
+            'grocery_service': get_grocery_service().stats.snapshot(),
+        })
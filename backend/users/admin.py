@@ -46,9 +46,10 @@ class RecipesAdmin(admin.ModelAdmin):
     readonly_fields = ['count_recipes_favorite']
 
     def count_recipes_favorite(self, obj):
-        return obj.favorite_recipes.count()
+        return obj.favorites_count
 
     count_recipes_favorite.short_description = 'Популярность'
+    count_recipes_favorite.admin_order_field = 'favorites_count'
 
 
 @admin.register(Tag)
@@ -1,13 +1,27 @@
+from django.db.models import BooleanField, Exists, OuterRef, Value
 from rest_framework import serializers
 from rest_framework.serializers import Serializer
 
 from users.models import Follow
 
 
+def annotate_is_subscribed(queryset, user):
+    """Resolve is_subscribed for every user in the queryset in one query."""
+    if user is None or user.is_anonymous:
+        return queryset.annotate(
+            is_subscribed=Value(False, output_field=BooleanField())
+        )
+    return queryset.annotate(is_subscribed=Exists(
+        Follow.objects.filter(author=OuterRef('pk'), user=user)
+    ))
+
+
 class IsSubscribedMixin(Serializer):
     is_subscribed = serializers.SerializerMethodField()
 
     def get_is_subscribed(self, data):
+        if hasattr(data, 'is_subscribed'):
+            return bool(data.is_subscribed)
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
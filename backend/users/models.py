@@ -22,6 +22,12 @@ class CustomUser(AbstractUser):
     email = models.EmailField('e-mail', max_length=254, unique=True)
     first_name = models.TextField('first_name', max_length=150)
     last_name = models.TextField('last_name', max_length=150)
+    recipes_count = models.PositiveIntegerField(
+        'recipes_count', default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'followers_count', default=0, db_index=True, editable=False
+    )
 
     @property
     def is_admin(self):
@@ -2,12 +2,19 @@ from djoser.serializers import UserCreateSerializer
 from rest_framework import serializers, validators
 
 from recipes.models import Recipe
-from recipes.serializers import RecipeSerializer
+from recipes.serializers import ShortRecipeSerializer
 from users.mixins import IsSubscribedMixin
 
 from .models import CustomUser, Follow
 
 
+def get_recipes_limit(request):
+    recipes_limit = request.GET.get('recipes_limit') if request else None
+    if recipes_limit and recipes_limit.isdigit():
+        return int(recipes_limit)
+    return None
+
+
 class UserRegistrationSerializer(UserCreateSerializer):
     class Meta:
         model = CustomUser
@@ -46,7 +53,7 @@ class CustomUserSerializer(serializers.ModelSerializer, IsSubscribedMixin):
 
 class UserSubscribeSerializer(serializers.ModelSerializer, IsSubscribedMixin):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField('get_recipes_count')
+    recipes_count = serializers.IntegerField(read_only=True)
     username = serializers.CharField(
         required=True,
         validators=[validators.UniqueValidator(
@@ -75,14 +82,11 @@ class UserSubscribeSerializer(serializers.ModelSerializer, IsSubscribedMixin):
         subscribe.save()
         return subscribe
 
-    def get_recipes_count(self, data):
-        return Recipe.objects.filter(author=data).count()
-
     def get_recipes(self, data):
-        recipes_limit = self.context.get('request').GET.get('recipes_limit')
-        recipes = (
-            data.recipes.all()[:int(recipes_limit)]
-            if recipes_limit else data.recipes
-        )
-        serializer = serializers.ListSerializer(child=RecipeSerializer())
-        return serializer.to_representation(recipes)
\ No newline at end of file
+        recipes = getattr(data, 'latest_recipes', None)
+        if recipes is None:
+            limit = get_recipes_limit(self.context.get('request'))
+            recipes = Recipe.objects.latest_per_author(
+                [data.pk], limit
+            ).get(data.pk, [])
+        return ShortRecipeSerializer(recipes, many=True).data
@@ -0,0 +1,88 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import CustomUser, Follow
+
+# Query budgets per endpoint; is_subscribed and recipes_count must not
+# add a query per serialized user.
+LIST_QUERIES = 2  # count, page
+DETAIL_QUERIES = 1
+SUBSCRIPTIONS_QUERIES = 3  # count, page, latest recipes per author
+
+
+class UserQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='pass'
+        )
+        cls.authors = [
+            CustomUser.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com', password='pass'
+            )
+            for number in range(12)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+            for number in range(3):
+                Recipe.objects.create(
+                    author=author, name=f'{author.username} recipe {number}',
+                    text='text', cooking_time=10, image='recipes/image.png'
+                )
+
+    def setUp(self):
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def get(self, client, url, queries):
+        with self.assertNumQueries(queries):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_list(self):
+        # 13 users: the first page is full, the last one holds one user.
+        for page, page_size in ((1, 6), (3, 1)):
+            for client, subscribed in (
+                (self.anonymous, False), (self.client, True)
+            ):
+                with self.subTest(page=page, subscribed=subscribed):
+                    data = self.get(
+                        client, f'{reverse("users-list")}?page={page}',
+                        LIST_QUERIES,
+                    )
+                    self.assertEqual(len(data['results']), page_size)
+                    for user in data['results']:
+                        self.assertIs(
+                            user['is_subscribed'],
+                            subscribed and user['id'] != self.reader.pk
+                        )
+
+    def test_detail(self):
+        url = reverse('users-detail', kwargs={'id': self.authors[0].pk})
+        for client, subscribed in (
+            (self.anonymous, False), (self.client, True)
+        ):
+            with self.subTest(subscribed=subscribed):
+                data = self.get(client, url, DETAIL_QUERIES)
+                self.assertIs(data['is_subscribed'], subscribed)
+
+    def test_subscriptions(self):
+        for page_size in (2, 10):
+            with self.subTest(page_size=page_size):
+                data = self.get(
+                    self.client,
+                    f'{reverse("subscriptions")}?limit={page_size}'
+                    f'&recipes_limit=2',
+                    SUBSCRIPTIONS_QUERIES,
+                )
+                self.assertEqual(len(data['results']), page_size)
+                for author in data['results']:
+                    self.assertIs(author['is_subscribed'], True)
+                    self.assertEqual(author['recipes_count'], 3)
+                    self.assertEqual(len(author['recipes']), 2)
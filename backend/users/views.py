@@ -1,3 +1,4 @@
+from django.db import transaction
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
@@ -7,8 +8,13 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.serializers import ListSerializer
 
+from recipes.feed import follow_author, unfollow_author
+from recipes.models import Recipe
+
+from .mixins import annotate_is_subscribed
 from .models import CustomUser, Follow
-from .serializers import CustomUserSerializer, UserSubscribeSerializer
+from .serializers import (CustomUserSerializer, UserSubscribeSerializer,
+                          get_recipes_limit)
 
 User = CustomUser()
 
@@ -17,6 +23,11 @@ class CustomUserViewSet(UserViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
 
+    def get_queryset(self):
+        return annotate_is_subscribed(
+            super().get_queryset(), self.request.user
+        )
+
     def get_permissions(self):
         if self.action == 'create':
             permission_classes = [AllowAny]
@@ -41,10 +52,13 @@ class CustomUserViewSet(UserViewSet):
             )
             if subscribed is True:
                 return Response(status=status.HTTP_400_BAD_REQUEST)
-            Follow.objects.get_or_create(
-                user=follower,
-                author=followed
-            )
+            with transaction.atomic():
+                _, created = Follow.objects.get_or_create(
+                    user=follower,
+                    author=followed
+                )
+                if created:
+                    follow_author(follower, followed)
             serializer = UserSubscribeSerializer(
                 context=self.get_serializer_context()
             )
@@ -53,9 +67,12 @@ class CustomUserViewSet(UserViewSet):
                 status=status.HTTP_201_CREATED
             )
         if request.method == 'DELETE':
-            Follow.objects.filter(
-                user=follower, author=followed
-            ).delete()
+            with transaction.atomic():
+                deleted, _ = Follow.objects.filter(
+                    user=follower, author=followed
+                ).delete()
+                if deleted:
+                    unfollow_author(follower, followed)
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
@@ -67,13 +84,21 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         current_user = request.user
-        followed_list = CustomUser.objects.filter(followed__user=current_user)
+        followed_list = annotate_is_subscribed(
+            CustomUser.objects.filter(followed__user=current_user),
+            current_user
+        ).order_by('id')
         paginator = PageNumberPagination()
         paginator.page_size_query_param = 'limit'
         authors = paginator.paginate_queryset(
             followed_list,
             request=request
         )
+        recipes = Recipe.objects.latest_per_author(
+            [author.pk for author in authors], get_recipes_limit(request)
+        )
+        for author in authors:
+            author.latest_recipes = recipes.get(author.pk, [])
         serializer = ListSerializer(
             child=UserSubscribeSerializer(),
             context=self.get_serializer_context()
@@ -3,6 +3,8 @@ import uuid
 from http.server import BaseHTTPRequestHandler, HTTPServer
 
 class MockServerHandler(BaseHTTPRequestHandler):
+    # Orders already created, keyed by the Idempotency-Key header.
+    orders = {}
 
     def do_POST(self):
         if self.path == "/api/shopping-cart":
@@ -29,7 +31,10 @@ class MockServerHandler(BaseHTTPRequestHandler):
                 }).encode('utf-8'))
                 return
 
-            order_uuid = str(uuid.uuid4())
+            idempotency_key = self.headers.get('Idempotency-Key')
+            order_uuid = self.orders.get(idempotency_key, str(uuid.uuid4()))
+            if idempotency_key:
+                self.orders[idempotency_key] = order_uuid
 
             response = {
                 "success": True,
@@ -47,10 +52,10 @@ class MockServerHandler(BaseHTTPRequestHandler):
             self.send_response(404)
             self.end_headers()
 
-def run_mock_server():
-    server_address = ('', 8080)
+def run_mock_server(port=8080):
+    server_address = ('', port)
     httpd = HTTPServer(server_address, MockServerHandler)
-    print("Mock server running on port 8080...")
+    print(f"Mock server running on port {port}...")
     httpd.serve_forever()
 
 if __name__ == "__main__":
@@ -411,7 +411,34 @@ class Api {
                 },
                 body: JSON.stringify({})
             }
-        ).then(this.checkResponse)
+        )
+            .then(this.checkResponse)
+            .then(job => this.waitForCheckout(job.job_id))
+    }
+
+    waitForCheckout(jobId, delay = 1000) {
+        const token = localStorage.getItem('token')
+        return fetch(
+            `/api/recipes/checkout/${jobId}/`,
+            {
+                method: 'GET',
+                headers: {
+                    ...this._headers,
+                    'authorization': `Token ${token}`
+                }
+            }
+        )
+            .then(this.checkResponse)
+            .then(job => {
+                if (job.status === 'done') {
+                    return { success: true, order_uuid: job.order_uuid }
+                }
+                if (job.status === 'failed') {
+                    return Promise.reject({ error: job.error })
+                }
+                return new Promise(resolve => setTimeout(resolve, delay))
+                    .then(() => this.waitForCheckout(jobId, delay))
+            })
     }
 
     suggestRecipe(ingredients) {
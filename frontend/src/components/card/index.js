@@ -7,6 +7,7 @@ const Card = ({
   name = 'Untitled',
   id,
   image,
+  image_variants,
   is_favorited,
   is_in_shopping_cart,
   tags,
@@ -21,7 +22,7 @@ const Card = ({
       <LinkComponent
         className={styles.card__title}
         href={`/recipes/${id}`}
-        title={<div className={styles.card__image} style={{ backgroundImage: `url(${ image })` }} />}
+        title={<div className={styles.card__image} style={{ backgroundImage: `url(${ (image_variants && image_variants.card) || image })` }} />}
       />
       <div className={styles.card__body}>
         <LinkComponent
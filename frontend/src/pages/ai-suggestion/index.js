@@ -7,18 +7,51 @@ const AiSuggestion = () => {
   const { ingredients, setIngredients, suggestion, setSuggestion } = useContext(AiSuggestionContext);
   const [loading, setLoading] = useState(false); // Add loading state
 
+  const readEvents = async (response, onEvent) => {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const messages = buffer.split('\n\n');
+      buffer = messages.pop();
+      messages.forEach((message) => {
+        let event = 'message';
+        const data = [];
+        message.split('\n').forEach((line) => {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          if (line.startsWith('data: ')) data.push(line.slice(6));
+        });
+        if (data.length) onEvent(event, JSON.parse(data.join('\n')));
+      });
+    }
+  };
+
   const handleSubmit = () => {
     setLoading(true); // Set loading to true when the request starts
+    setSuggestion('');
     fetch('/api/recipes/ai-suggestion/', {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: {
+        'Content-Type': 'application/json',
+        Accept: 'text/event-stream',
+      },
       body: JSON.stringify({ ingredients }),
     })
-      .then((res) => res.json())
-      .then((data) => {
-        setSuggestion(data.suggestion || '');
-        setLoading(false); // Set loading to false after getting the response
+      .then((res) => {
+        let text = '';
+        return readEvents(res, (event, data) => {
+          if (event === 'error') {
+            console.error(data.error);
+          } else if (data.delta) {
+            text += data.delta;
+            setSuggestion(text);
+          }
+        });
       })
+      .then(() => setLoading(false))
       .catch((err) => {
         console.error(err);
         setLoading(false); // Set loading to false if there is an error